@@ -0,0 +1,51 @@
+"""Выгрузка списка покупок в текст, CSV и JSON по частям."""
+import csv
+import json
+
+
+class Echo:
+    """Файлоподобный объект, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def shopping_list_item(item):
+    ingredient_id, name, measurement_unit, amount = item
+    return {
+        'id': ingredient_id,
+        'name': name,
+        'measurement_unit': measurement_unit,
+        'amount': amount,
+    }
+
+
+def text_lines(items):
+    for _, name, measurement_unit, amount in items:
+        yield f'- {name} ({measurement_unit}) - {amount}\n'
+
+
+def csv_lines(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for _, name, measurement_unit, amount in items:
+        yield writer.writerow((name, measurement_unit, amount))
+
+
+def json_chunks(items):
+    separator = '['
+    for item in items:
+        yield separator + json.dumps(
+            shopping_list_item(item),
+            ensure_ascii=False,
+            separators=(',', ':')
+        )
+        separator = ','
+    yield ']' if separator == ',' else '[]'
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', text_lines),
+    'csv': ('text/csv; charset=utf-8', csv_lines),
+    'json': ('application/json', json_chunks),
+}
@@ -0,0 +1,102 @@
+from .fields import image_variant_urls
+from .serializers import RecipeReadSerializer, get_subscriptions
+from foodgram.metrics import timer
+
+
+class RecipeFastReadSerializer:
+    """Быстрое представление рецептов для списка и просмотра.
+
+    Возвращает те же данные, что и RecipeReadSerializer, но строит их
+    напрямую из рецептов, подготовленных RecipeQuerySet.with_user_flags
+    и with_related, без полей DRF для каждого объекта.
+    """
+
+    def __init__(self, instance=None, many=False, context=None, fields=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.request = self.context.get('request')
+        self.fields = (
+            fields if fields is not None
+            else RecipeReadSerializer.Meta.fields
+        )
+        self.builders = [
+            (name, getattr(self, f'get_{name}')) for name in self.fields
+        ]
+
+    @property
+    def data(self):
+        with timer('serializer'):
+            if self.many:
+                return [
+                    self.to_representation(recipe) for recipe in self.instance
+                ]
+            return self.to_representation(self.instance)
+
+    def to_representation(self, recipe):
+        return {name: builder(recipe) for name, builder in self.builders}
+
+    def file_url(self, file):
+        if not file:
+            return None
+        if self.request is not None:
+            return self.request.build_absolute_uri(file.url)
+        return file.url
+
+    def get_id(self, recipe):
+        return recipe.id
+
+    def get_tags(self, recipe):
+        return [
+            {'id': tag.id, 'name': tag.name, 'slug': tag.slug}
+            for tag in recipe.tags.all()
+        ]
+
+    def get_author(self, recipe):
+        author = recipe.author
+        return {
+            'email': author.email,
+            'id': author.id,
+            'username': author.username,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+            'is_subscribed': bool(
+                self.request
+                and self.request.user.is_authenticated
+                and author.id in get_subscriptions(self.context)
+            ),
+            'avatar': self.file_url(author.avatar),
+        }
+
+    def get_ingredients(self, recipe):
+        return [
+            {
+                'id': recipe_ingredient.ingredient.id,
+                'name': recipe_ingredient.ingredient.name,
+                'measurement_unit': (
+                    recipe_ingredient.ingredient.measurement_unit),
+                'amount': recipe_ingredient.amount,
+            }
+            for recipe_ingredient in recipe.recipeingredient_set.all()
+        ]
+
+    def get_is_favorited(self, recipe):
+        return bool(recipe.is_favorited)
+
+    def get_is_in_shopping_cart(self, recipe):
+        return bool(recipe.is_in_shopping_cart)
+
+    def get_name(self, recipe):
+        return recipe.name
+
+    def get_image(self, recipe):
+        return self.file_url(recipe.image)
+
+    def get_images(self, recipe):
+        return image_variant_urls(recipe.image_variants, self.request)
+
+    def get_text(self, recipe):
+        return recipe.text
+
+    def get_cooking_time(self, recipe):
+        return recipe.cooking_time
@@ -0,0 +1,28 @@
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+
+class HybridImageField(Base64ImageField):
+    """Изображение в base64 или файлом из multipart-запроса."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            return serializers.ImageField.to_internal_value(self, data)
+        return super().to_internal_value(data)
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии изображения по названию размера."""
+
+    def to_representation(self, variants):
+        return image_variant_urls(variants, self.context.get('request'))
+
+
+def image_variant_urls(variants, request=None):
+    urls = {}
+    for name, path in variants.items():
+        url = default_storage.url(path)
+        urls[name] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -1,19 +1,43 @@
+from django.db.models import Exists, OuterRef
+from django_filters.fields import MultipleChoiceField
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.catalog import tag_catalog
+from recipes.models import Recipe
+from recipes.search import search_recipes
+
+
+class TagSlugsField(MultipleChoiceField):
+    """Слаги тэгов, проверяемые по справочнику тэгов."""
+
+    def valid_value(self, value):
+        return tag_catalog.contains(value)
+
+
+class TagSlugsFilter(filters.MultipleChoiceFilter):
+    field_class = TagSlugsField
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug',
+    tags = TagSlugsFilter(
+        choices=tag_catalog.choices,
+        method='filter_tags'
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'tags', 'author', 'is_favorited', 'is_in_shopping_cart', 'search'
+        )
+
+    def filter_tags(self, queryset, name, value):
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag_id__in=tag_catalog.get_ids(value)
+        )))
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -27,10 +51,5 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shopping_cart__user=user)
         return queryset
 
-
-class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='startswith')
-
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
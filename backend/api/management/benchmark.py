@@ -0,0 +1,10 @@
+"""Общие функции команд замера производительности."""
+from django.conf import settings
+
+
+def request_host():
+    """Первый хост из ALLOWED_HOSTS без шаблонов для тестовых запросов."""
+    return next(
+        (host for host in settings.ALLOWED_HOSTS if '*' not in host),
+        'localhost'
+    )
@@ -0,0 +1,174 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.management.benchmark import request_host
+from link_shortner.models import Link
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+BUDGET = Path(__file__).resolve().parents[2] / 'benchmark_budget.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер задержек и числа SQL-запросов основных эндпоинтов API. '
+        'Завершается с ошибкой при превышении бюджета запросов или '
+        'замедлении относительно базового замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget', default=BUDGET,
+            help='JSON с эндпоинтами и допустимым числом запросов.'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON с результатами предыдущего замера для сравнения.'
+        )
+        parser.add_argument(
+            '--save',
+            help='Сохранить результаты замера в JSON для использования '
+                 'в качестве --baseline.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимое замедление p95 относительно --baseline.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество запросов к каждому эндпоинту.'
+        )
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Замерить только указанные эндпоинты.'
+        )
+
+    def load(self, path):
+        try:
+            with open(path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+
+    def get_user(self):
+        """Пользователь с подписками и непустым списком покупок."""
+        user = User.objects.filter(
+            subscriber__isnull=False, shopping_cart__isnull=False
+        ).order_by('id').first()
+        if user is None:
+            raise CommandError(
+                'В базе нет подходящих данных, заполните ее seed_load.')
+        return user
+
+    def get_placeholders(self):
+        """Значения для подстановки в адреса эндпоинтов."""
+        recipe = Recipe.objects.order_by('-favorites_count').only(
+            'id', 'name', 'author_id').first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        short_url = Link.objects.values_list('short_url', flat=True).first()
+        ingredient = Ingredient.objects.values_list('name', flat=True).first()
+        if None in (recipe, short_url, ingredient) or len(tags) < 2:
+            raise CommandError(
+                'В базе нет подходящих данных, заполните ее seed_load.')
+        return {
+            'recipe': recipe.id,
+            'author': recipe.author_id,
+            'search': recipe.name.split()[0],
+            'tag': tags[0],
+            'other_tag': tags[1],
+            'short_url': short_url,
+            'ingredient': ingredient[:2],
+        }
+
+    def measure(self, client, url, headers, expected_status, repeat):
+        """Прогрев и repeat замеров одного эндпоинта."""
+        client.get(url, **headers)
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = client.get(url, **headers)
+                timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != expected_status:
+                raise CommandError(
+                    f'{url}: ответ {response.status_code}, '
+                    f'ожидался {expected_status}.'
+                )
+        percentiles = statistics.quantiles(timings, n=100)
+        return {
+            'queries': len(context.captured_queries),
+            'p50': statistics.median(timings),
+            'p95': percentiles[94],
+            'p99': percentiles[98],
+        }
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 2:
+            raise CommandError('--repeat должен быть не меньше 2.')
+        endpoints = self.load(options['budget'])
+        if options['endpoints']:
+            unknown = set(options['endpoints']) - set(endpoints)
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные эндпоинты: {", ".join(sorted(unknown))}')
+            endpoints = {
+                name: endpoints[name] for name in options['endpoints']}
+        baseline = (
+            self.load(options['baseline']) if options['baseline'] else {})
+        user = self.get_user()
+        token, _ = Token.objects.get_or_create(user=user)
+        placeholders = self.get_placeholders()
+        host = request_host()
+        client = Client(HTTP_HOST=host)
+        results = {}
+        failures = []
+        self.stdout.write(
+            f'{"эндпоинт":<30} {"запросы":>8} {"p50, мс":>9} '
+            f'{"p95, мс":>9} {"p99, мс":>9}'
+        )
+        for name, endpoint in endpoints.items():
+            headers = (
+                {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+                if endpoint.get('auth') else {}
+            )
+            result = self.measure(
+                client,
+                endpoint['url'].format(**placeholders),
+                headers,
+                endpoint.get('status', 200),
+                options['repeat']
+            )
+            results[name] = result
+            self.stdout.write(
+                f'{name:<30} {result["queries"]:>8} {result["p50"]:>9.2f} '
+                f'{result["p95"]:>9.2f} {result["p99"]:>9.2f}'
+            )
+            if result['queries'] > endpoint['max_queries']:
+                failures.append(
+                    f'{name}: {result["queries"]} SQL-запросов при бюджете '
+                    f'{endpoint["max_queries"]}'
+                )
+            if name in baseline:
+                limit = baseline[name]['p95'] * (1 + options['tolerance'])
+                if result['p95'] > limit:
+                    failures.append(
+                        f'{name}: p95 {result["p95"]:.2f} мс, '
+                        f'допустимо {limit:.2f} мс'
+                    )
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=4)
+        if failures:
+            raise CommandError(
+                'Превышен бюджет эндпоинтов:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Бюджет не превышен.'))
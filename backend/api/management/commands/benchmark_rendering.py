@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.management.benchmark import request_host
+from api.renderers import FastJSONRenderer
+from api.views import RecipeViewSet
+from foodgram.constants import BROTLI_QUALITY
+from foodgram.middleware import brotli
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение времени рендеринга и размера ответа списка рецептов '
+        'для JSONRenderer и FastJSONRenderer, со сжатием и без.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=100,
+            help='Количество рецептов на странице.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='Количество повторов рендеринга.'
+        )
+
+    def get_page(self, limit):
+        host = request_host()
+        request = APIRequestFactory().get(
+            '/api/recipes/', {'limit': limit}, HTTP_HOST=host)
+        response = RecipeViewSet.as_view({'get': 'list'})(request)
+        if not response.data['results']:
+            raise CommandError('В базе нет рецептов, заполните ее seed_load.')
+        return response.data
+
+    def measure(self, renderer, data, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            content = renderer.render(data)
+        return content, (time.perf_counter() - start) / repeat
+
+    def handle(self, *args, **options):
+        data = self.get_page(options['limit'])
+        self.stdout.write(
+            f'Рецептов на странице: {len(data["results"])}, '
+            f'повторов: {options["repeat"]}'
+        )
+        baseline, baseline_time = self.measure(
+            JSONRenderer(), data, options['repeat'])
+        fast, fast_time = self.measure(
+            FastJSONRenderer(), data, options['repeat'])
+        if fast != baseline:
+            raise CommandError('Результаты рендереров различаются!')
+        self.stdout.write(
+            f'JSONRenderer:     {baseline_time * 1000:.3f} мс\n'
+            f'FastJSONRenderer: {fast_time * 1000:.3f} мс '
+            f'(в {baseline_time / fast_time:.1f} раза быстрее)'
+        )
+        sizes = {'без сжатия': len(baseline)}
+        sizes['gzip'] = len(compress_string(baseline))
+        if brotli:
+            sizes['brotli'] = len(
+                brotli.compress(baseline, quality=BROTLI_QUALITY))
+        for name, size in sizes.items():
+            self.stdout.write(
+                f'Размер ответа, {name}: {size} байт '
+                f'({size / len(baseline):.0%})'
+            )
@@ -0,0 +1,89 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+
+from api.fast_serializers import RecipeFastReadSerializer
+from api.management.benchmark import request_host
+from api.serializers import RecipeReadSerializer
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка совпадения ответов RecipeReadSerializer и '
+        'RecipeFastReadSerializer и сравнение их скорости.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=100,
+            help='Количество рецептов на странице.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество повторов сериализации.'
+        )
+
+    def get_request(self, user):
+        host = request_host()
+        request = APIRequestFactory().get('/api/recipes/', HTTP_HOST=host)
+        request.user = user
+        return request
+
+    def get_page(self, user, limit):
+        return list(
+            Recipe.objects.with_user_flags(user).with_related()[:limit])
+
+    def serialize(self, serializer_class, page, request, fields=None):
+        return serializer_class(
+            page, many=True, context={'request': request}, fields=fields
+        ).data
+
+    def check_parity(self, page, request):
+        for fields in (None, RecipeReadSerializer.Meta.card_fields):
+            expected = self.serialize(
+                RecipeReadSerializer, page, request, fields)
+            actual = self.serialize(
+                RecipeFastReadSerializer, page, request, fields)
+            if actual != expected:
+                raise CommandError(
+                    f'Ответы сериализаторов различаются для пользователя '
+                    f'{request.user}, поля: {fields or "все"}'
+                )
+
+    def measure(self, serializer_class, page, request, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            self.serialize(serializer_class, page, request)
+        return (time.perf_counter() - start) / repeat
+
+    def handle(self, *args, **options):
+        users = [AnonymousUser()]
+        user = User.objects.filter(subscriber__isnull=False).first()
+        if user is not None:
+            users.append(user)
+        for user in users:
+            request = self.get_request(user)
+            page = self.get_page(user, options['limit'])
+            if not page:
+                raise CommandError(
+                    'В базе нет рецептов, заполните ее seed_load.')
+            self.check_parity(page, request)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ответы совпадают для {len(users)} пользователей.'))
+        baseline_time = self.measure(
+            RecipeReadSerializer, page, request, options['repeat'])
+        fast_time = self.measure(
+            RecipeFastReadSerializer, page, request, options['repeat'])
+        self.stdout.write(
+            f'Рецептов на странице: {len(page)}, '
+            f'повторов: {options["repeat"]}\n'
+            f'RecipeReadSerializer:     {baseline_time * 1000:.3f} мс\n'
+            f'RecipeFastReadSerializer: {fast_time * 1000:.3f} мс '
+            f'(в {baseline_time / fast_time:.1f} раза быстрее)'
+        )
@@ -0,0 +1,99 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from recipes.models import Recipe, RecipeIngredient, ShoppingCart
+from recipes.shopping_list import add_recipe, user_items
+from recipes.units import normalize
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение списка покупок, собранного из рецептов, с хранимым '
+        'списком и замер скорости сборки списка в общих единицах для '
+        'списка покупок из большого числа рецептов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=500,
+            help='Количество рецептов в списке покупок.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество повторов сборки списка.'
+        )
+
+    def aggregated_items(self, user):
+        """Список покупок, собранный из рецептов при каждом запросе."""
+        return RecipeIngredient.objects.filter(
+            recipe__shopping_cart__user=user
+        ).values(
+            'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit'
+        ).annotate(total=Sum('amount')).order_by(
+            'ingredient__name', 'ingredient__measurement_unit'
+        ).values_list(
+            'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'total'
+        )
+
+    def measure(self, build, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            build()
+        return (time.perf_counter() - start) / repeat
+
+    def run(self, count, repeat):
+        """Замеры на временном пользователе, изменения откатываются."""
+        user = User.objects.create(
+            username='benchmark-shopping-list',
+            email='benchmark-shopping-list@localhost'
+        )
+        recipes = list(Recipe.objects.annotate(
+            ingredients_count=Count('recipeingredient')
+        ).order_by('-ingredients_count').values_list('id', flat=True)[:count])
+        if len(recipes) < count:
+            raise CommandError(
+                f'В базе меньше {count} рецептов, заполните ее seed_load.')
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe_id=recipe_id)
+            for recipe_id in recipes
+        )
+        for recipe_id in recipes:
+            add_recipe(user.id, recipe_id)
+        rows = list(user_items(user))
+        expected = list(normalize(self.aggregated_items(user)))
+        if list(normalize(rows)) != expected:
+            raise CommandError(
+                'Хранимый список покупок не совпадает со списком, '
+                'собранным из рецептов.'
+            )
+        return {
+            'rows': len(rows),
+            'lines': len(expected),
+            'aggregated': self.measure(
+                lambda: list(normalize(self.aggregated_items(user))), repeat),
+            'stored': self.measure(
+                lambda: list(normalize(user_items(user))), repeat),
+            'normalize': self.measure(lambda: list(normalize(rows)), repeat),
+        }
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            result = self.run(options['recipes'], options['repeat'])
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS(
+            'Хранимый список совпадает со списком из рецептов.'))
+        self.stdout.write(
+            f'Рецептов: {options["recipes"]}, ингредиентов: '
+            f'{result["rows"]}, строк списка: {result["lines"]}\n'
+            f'Сборка из рецептов:  {result["aggregated"] * 1000:.3f} мс\n'
+            f'Хранимый список:     {result["stored"] * 1000:.3f} мс\n'
+            f'Приведение единиц:   {result["normalize"] * 1000:.3f} мс'
+        )
@@ -1,4 +1,4 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 from foodgram.constants import PAGINATION_PAGE_SIZE
 
@@ -6,3 +6,11 @@ from foodgram.constants import PAGINATION_PAGE_SIZE
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = PAGINATION_PAGE_SIZE
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Постраничный вывод рецептов по курсору без подсчета общего числа."""
+
+    page_size_query_param = 'limit'
+    page_size = PAGINATION_PAGE_SIZE
+    ordering = ('-pub_date', '-id')
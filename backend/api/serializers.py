@@ -1,11 +1,17 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from djoser.serializers import UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.reverse import reverse
 
+from .fields import HybridImageField, ImageVariantsField
+from foodgram.constants import PANTRY_MAX_MISSING
 from link_shortner.models import Link
+from recipes import shopping_list
+from recipes.counters import change_counter
+from recipes.feed import fan_out
 from recipes.models import (
     Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Subscribe,
     Tag
@@ -15,14 +21,34 @@ from recipes.models import (
 User = get_user_model()
 
 
+def get_subscriptions(context):
+    """Id авторов, на которых подписан пользователь.
+
+    Множество загружается одним запросом и сохраняется в контексте,
+    общем для всех вложенных сериализаторов пользователя в ответе.
+    """
+    subscriptions = context.get('subscriptions')
+    if subscriptions is None:
+        user = context.get('request').user
+        subscriptions = set(
+            user.subscriber.values_list('author_id', flat=True))
+        context['subscriptions'] = subscriptions
+    return subscriptions
+
+
 class AvatarSerializer(serializers.ModelSerializer):
     """Сериализатор для аватара пользователя."""
 
-    avatar = Base64ImageField(allow_null=True)
+    avatar = HybridImageField(allow_null=True)
+    avatar_variants = ImageVariantsField()
 
     class Meta:
         model = User
-        fields = ('avatar',)
+        fields = ('avatar', 'avatar_variants')
+
+    def update(self, instance, validated_data):
+        instance.avatar_variants = {}
+        return super().update(instance, validated_data)
 
 
 class CustomUserSerializer(UserSerializer):
@@ -39,18 +65,18 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, author):
-        user = self.context.get('request').user
-        return (
-            self.context.get('request')
-            and user.is_authenticated
-            and Subscribe.objects.filter(user=user, author=author).exists()
+        request = self.context.get('request')
+        return bool(
+            request
+            and request.user.is_authenticated
+            and author.id in get_subscriptions(self.context)
         )
 
 
 class SubscribeReadSerializer(CustomUserSerializer):
     """Сериализатор для отображения подписок пользователя."""
 
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
     recipes = serializers.SerializerMethodField()
 
     class Meta(CustomUserSerializer.Meta):
@@ -59,20 +85,19 @@ class SubscribeReadSerializer(CustomUserSerializer):
         )
 
     def get_recipes(self, author):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = author.recipes.all()
-        if limit:
-            try:
-                recipes = recipes[:int(limit)]
-            except ValueError:
-                pass
+        recipes = getattr(author, 'latest_recipes', None)
+        if recipes is None:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            recipes = author.recipes.all()
+            if limit:
+                try:
+                    recipes = recipes[:int(limit)]
+                except ValueError:
+                    pass
         serializer = RecipeShortSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
-    def get_recipes_count(self, author):
-        return author.recipes.count()
-
 
 class SubscribeWriteSerializer(serializers.ModelSerializer):
     """Сериализатор для сохранения подписок пользователя."""
@@ -148,7 +173,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         many=True, allow_empty=False)
     tags = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all(), allow_empty=False)
-    image = Base64ImageField()
+    image = HybridImageField()
 
     class Meta:
         model = Recipe
@@ -203,23 +228,71 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        recipe = Recipe.objects.create(
-            author=self.context.get('request').user,
-            **validated_data)
-        recipe.tags.set(tags)
-        self.create_ingredients(recipe=recipe, ingredients=ingredients)
+        author = self.context.get('request').user
+        with transaction.atomic():
+            recipe = Recipe.objects.create(author=author, **validated_data)
+            recipe.tags.set(tags)
+            self.create_ingredients(recipe=recipe, ingredients=ingredients)
+            change_counter(User, author.id, 'recipes_count', 1)
+            fan_out(recipe)
         return recipe
 
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        """Изменение только добавленных, удаленных и измененных записей.
+
+        Возвращает изменения количеств по id ингредиентов.
+        """
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipeingredient_set.all()
+        }
+        amounts = {
+            ingredient['ingredient'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        deltas = {
+            ingredient_id: -current[ingredient_id].amount
+            for ingredient_id in removed
+        }
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            recipe_ingredient = current.get(ingredient_id)
+            if recipe_ingredient is None:
+                deltas[ingredient_id] = amount
+            elif recipe_ingredient.amount != amount:
+                deltas[ingredient_id] = amount - recipe_ingredient.amount
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        RecipeWriteSerializer.create_ingredients(recipe, [
+            ingredient for ingredient in ingredients
+            if ingredient['ingredient'].id not in current
+        ])
+        return deltas
+
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
-        instance.ingredients.clear()
-        self.create_ingredients(recipe=instance, ingredients=ingredients)
         tags = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.tags.set(tags)
-        return super().update(instance, validated_data)
+        if 'image' in validated_data:
+            instance.image_variants = {}
+        with transaction.atomic():
+            deltas = self.update_ingredients(
+                recipe=instance, ingredients=ingredients)
+            shopping_list.change_recipe(instance.id, deltas)
+            instance.tags.set(tags)
+            instance = super().update(instance, validated_data)
+        return instance
 
     def to_representation(self, instance):
+        user = self.context.get('request').user
+        instance = Recipe.objects.with_user_flags(user).with_related().get(
+            pk=instance.pk)
         return RecipeReadSerializer(instance, context=self.context).data
 
 
@@ -230,37 +303,46 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         many=True, source='recipeingredient_set')
     tags = TagSerializer(read_only=True, many=True)
     author = CustomUserSerializer(read_only=True)
-    is_favorited = serializers.SerializerMethodField(read_only=True)
-    is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
+    images = ImageVariantsField(source='image_variants')
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
+            'is_in_shopping_cart', 'name', 'image', 'images', 'text',
+            'cooking_time',
         )
-
-    def get_is_favorited(self, recipe):
-        user = self.context.get('request').user
-        return (
-            user.is_authenticated
-            and user.favorite.filter(recipe=recipe).exists()
+        card_fields = (
+            'id', 'tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+            'name', 'image', 'images', 'cooking_time',
         )
 
-    def get_is_in_shopping_cart(self, recipe):
-        user = self.context.get('request').user
-        return (
-            user.is_authenticated
-            and user.shopping_cart.filter(recipe=recipe).exists()
-        )
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class PantrySerializer(serializers.Serializer):
+    """Сериализатор для подбора рецептов по имеющимся ингредиентам."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False)
+    max_missing = serializers.IntegerField(
+        min_value=0, default=PANTRY_MAX_MISSING)
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Сериализатор для чтения короткой записи рецептов."""
 
+    images = ImageVariantsField(source='image_variants')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
 
 class LinkSerializers(serializers.ModelSerializer):
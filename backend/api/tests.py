@@ -0,0 +1,475 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .fast_serializers import RecipeFastReadSerializer
+from .renderers import FastJSONRenderer
+from .serializers import RecipeReadSerializer
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+    ShoppingListItem, Subscribe, Tag
+)
+
+User = get_user_model()
+
+
+class RecipeFastReadSerializerTest(TestCase):
+    """Ответ RecipeFastReadSerializer совпадает с RecipeReadSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов',
+            avatar='users/author.png'
+        )
+        other_author = User.objects.create_user(
+            username='other', email='other@example.com',
+            first_name='Другой', last_name='Автор'
+        )
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Рецептов'
+        )
+        Subscribe.objects.create(user=cls.reader, author=cls.author)
+        breakfast = Tag.objects.create(name='Завтрак', slug='breakfast')
+        dinner = Tag.objects.create(name='Ужин', slug='dinner')
+        flour = Ingredient.objects.create(name='мука', measurement_unit='г')
+        milk = Ingredient.objects.create(name='молоко', measurement_unit='мл')
+        recipes = []
+        for index, (author, tags) in enumerate((
+            (cls.author, (breakfast, dinner)),
+            (cls.author, (dinner,)),
+            (other_author, ()),
+        )):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {index}', text='Описание',
+                cooking_time=10 + index, image=f'recipes/{index}.png',
+                image_variants=(
+                    {'small': f'recipes/variants/{index}.webp'}
+                    if index % 2 == 0 else {}
+                )
+            )
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=flour, amount=100 + index)
+            if index:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=milk, amount=200)
+            recipes.append(recipe)
+        Favorite.objects.create(user=cls.reader, recipe=recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=recipes[1])
+
+    def serialize(self, serializer_class, user, fields=None):
+        request = APIRequestFactory().get('/api/recipes/')
+        request.user = user
+        page = Recipe.objects.with_user_flags(user).with_related()
+        return serializer_class(
+            page, many=True, context={'request': request}, fields=fields
+        ).data
+
+    def assert_same_data(self, user, fields=None):
+        expected = self.serialize(RecipeReadSerializer, user, fields)
+        actual = self.serialize(RecipeFastReadSerializer, user, fields)
+        self.assertEqual(actual, [dict(item) for item in expected])
+        self.assertEqual(
+            [list(item) for item in actual],
+            [list(item) for item in expected]
+        )
+        return actual
+
+    def test_anonymous_user(self):
+        data = self.assert_same_data(AnonymousUser())
+        self.assertFalse(any(item['is_favorited'] for item in data))
+        self.assertFalse(
+            any(item['author']['is_subscribed'] for item in data))
+
+    def test_subscribed_user(self):
+        data = self.assert_same_data(self.reader)
+        self.assertEqual(
+            [item['is_favorited'] for item in data], [False, False, True])
+        self.assertEqual(
+            [item['is_in_shopping_cart'] for item in data],
+            [False, True, False]
+        )
+        self.assertEqual(
+            [item['author']['is_subscribed'] for item in data],
+            [False, True, True]
+        )
+        self.assertIsNotNone(data[1]['author']['avatar'])
+
+    def test_card_fields(self):
+        for user in (AnonymousUser(), self.reader):
+            with self.subTest(user=user):
+                self.assert_same_data(
+                    user, RecipeReadSerializer.Meta.card_fields)
+
+    def test_fields_subset(self):
+        data = self.assert_same_data(
+            self.reader, ('id', 'author', 'is_favorited', 'name'))
+        self.assertEqual(
+            list(data[0]), ['id', 'author', 'is_favorited', 'name'])
+
+    def test_empty_fields(self):
+        self.assertEqual(self.assert_same_data(self.reader, ()), [{}] * 3)
+
+    def test_empty_fields_parameter(self):
+        for fields in (',', ' , '):
+            with self.subTest(fields=fields):
+                response = self.client.get(
+                    '/api/recipes/', {'fields': fields})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('fields', response.json())
+
+
+class FeedTest(TestCase):
+    """Неразосланные рецепты остаются в лентах подписчиков."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader, cls.other = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com',
+                first_name='Имя', last_name='Фамилия'
+            )
+            for name in ('author', 'reader', 'other')
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def feed_ids(self):
+        response = self.client_for(self.reader).get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    @mock.patch('recipes.feed.FEED_FANOUT_LIMIT', 1)
+    def test_author_below_fanout_limit(self):
+        for user in (self.reader, self.other):
+            self.assertEqual(self.client_for(user).post(
+                f'/api/users/{self.author.id}/subscribe/').status_code, 201)
+        recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/recipe.png'
+        )
+        self.assertEqual(self.feed_ids(), [recipe.id])
+        self.assertEqual(self.client_for(self.other).delete(
+            f'/api/users/{self.author.id}/subscribe/').status_code, 204)
+        self.assertFalse(Recipe.objects.get(id=recipe.id).in_feeds)
+        self.assertEqual(self.feed_ids(), [recipe.id])
+
+
+class ShoppingListTestCase(TestCase):
+    """Рецепт автора в списке покупок покупателя."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.buyer = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com',
+                first_name='Имя', last_name='Фамилия'
+            )
+            for name in ('author', 'buyer')
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.flour, cls.milk, cls.salt = (
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('мука', 'г'), ('молоко', 'мл'), ('соль', 'г'))
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Блины', text='Описание',
+            cooking_time=30, image='recipes/images/recipe.png'
+        )
+        cls.recipe.tags.set([cls.tag])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=cls.recipe, ingredient=ingredient,
+                             amount=amount)
+            for ingredient, amount in ((cls.flour, 200), (cls.milk, 500))
+        )
+
+    def setUp(self):
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.author)
+        self.buyer_client = APIClient()
+        self.buyer_client.force_authenticate(self.buyer)
+
+    def add_to_cart(self, recipe=None):
+        response = self.buyer_client.post(
+            f'/api/recipes/{(recipe or self.recipe).id}/shopping_cart/')
+        self.assertEqual(response.status_code, 201)
+
+    def update_recipe(self, ingredients):
+        """Изменение ингредиентов рецепта через API.
+
+        Возвращает SQL-запросы, изменившие ингредиенты рецептов.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.author_client.patch(
+                f'/api/recipes/{self.recipe.id}/',
+                {
+                    'name': 'Блины', 'text': 'Описание', 'cooking_time': 30,
+                    'tags': [self.tag.id],
+                    'ingredients': [
+                        {'id': ingredient.id, 'amount': amount}
+                        for ingredient, amount in ingredients
+                    ],
+                },
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        return [
+            query['sql'].split()[0] for query in queries.captured_queries
+            if 'recipes_recipeingredient' in query['sql'].split('WHERE')[0]
+            and not query['sql'].startswith('SELECT')
+        ]
+
+    def recipe_amounts(self):
+        return dict(RecipeIngredient.objects.filter(
+            recipe=self.recipe).values_list('ingredient_id', 'amount'))
+
+    def list_amounts(self, user=None):
+        return dict(ShoppingListItem.objects.filter(
+            user=user or self.buyer
+        ).values_list('ingredient_id', 'amount'))
+
+
+class RecipeUpdateIngredientsTest(ShoppingListTestCase):
+    """Изменение рецепта меняет только измененные ингредиенты."""
+
+    def setUp(self):
+        super().setUp()
+        self.add_to_cart()
+
+    def test_unchanged_ingredients(self):
+        self.assertEqual(
+            self.update_recipe(((self.flour, 200), (self.milk, 500))), [])
+        self.assertEqual(
+            self.list_amounts(), {self.flour.id: 200, self.milk.id: 500})
+
+    def test_changed_amount(self):
+        self.assertEqual(
+            self.update_recipe(((self.flour, 300), (self.milk, 500))),
+            ['UPDATE']
+        )
+        self.assertEqual(
+            self.recipe_amounts(), {self.flour.id: 300, self.milk.id: 500})
+        self.assertEqual(
+            self.list_amounts(), {self.flour.id: 300, self.milk.id: 500})
+
+    def test_added_and_removed_ingredients(self):
+        self.assertEqual(
+            self.update_recipe(((self.flour, 200), (self.salt, 5))),
+            ['DELETE', 'INSERT']
+        )
+        self.assertEqual(
+            self.recipe_amounts(), {self.flour.id: 200, self.salt.id: 5})
+        self.assertEqual(
+            self.list_amounts(), {self.flour.id: 200, self.salt.id: 5})
+
+
+class ShoppingListTest(ShoppingListTestCase):
+    """Суммы ингредиентов списка покупок совпадают с рецептами."""
+
+    def setUp(self):
+        super().setUp()
+        self.pie = Recipe.objects.create(
+            author=self.author, name='Пирог', text='Описание',
+            cooking_time=60, image='recipes/images/pie.png'
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=self.pie, ingredient=ingredient,
+                             amount=amount)
+            for ingredient, amount in ((self.flour, 400), (self.salt, 5))
+        )
+
+    def tearDown(self):
+        call_command('rebuild_shopping_lists', '--check', stdout=StringIO())
+
+    def test_add_and_remove(self):
+        self.add_to_cart()
+        self.add_to_cart(self.pie)
+        self.assertEqual(self.list_amounts(), {
+            self.flour.id: 600, self.milk.id: 500, self.salt.id: 5})
+        response = self.buyer_client.delete(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            self.list_amounts(), {self.flour.id: 400, self.salt.id: 5})
+        response = self.buyer_client.delete(
+            f'/api/recipes/{self.pie.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.list_amounts(), {})
+
+    def test_edit_carted_recipe(self):
+        self.add_to_cart()
+        self.add_to_cart(self.pie)
+        self.update_recipe(((self.flour, 100), (self.salt, 3)))
+        self.assertEqual(
+            self.list_amounts(), {self.flour.id: 500, self.salt.id: 8})
+        self.assertEqual(self.list_amounts(self.author), {})
+
+    def test_delete_recipe(self):
+        self.add_to_cart()
+        self.add_to_cart(self.pie)
+        response = self.author_client.delete(
+            f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            self.list_amounts(), {self.flour.id: 400, self.salt.id: 5})
+
+
+class DownloadShoppingCartTest(ShoppingListTestCase):
+    """Форматы и ETag выгрузки списка покупок."""
+
+    def setUp(self):
+        super().setUp()
+        self.add_to_cart()
+
+    def download(self, file_format=None, **headers):
+        # Пользователь перечитывается, как при аутентификации запроса.
+        self.buyer.refresh_from_db()
+        params = {'format': file_format} if file_format else {}
+        response = self.buyer_client.get(
+            '/api/recipes/download_shopping_cart/', params, **headers)
+        # Поток читается сразу, пока курсор выгрузки открыт.
+        response.body = (
+            b''.join(response.streaming_content) if response.streaming
+            else response.content
+        )
+        return response
+
+    def test_formats(self):
+        for file_format, content_type, line in (
+            (None, 'text/plain; charset=utf-8', '- мука (г) - 200'),
+            ('txt', 'text/plain; charset=utf-8', '- мука (г) - 200'),
+            ('csv', 'text/csv; charset=utf-8', 'мука,г,200'),
+            ('json', 'application/json', '"name":"мука"'),
+        ):
+            with self.subTest(file_format=file_format):
+                response = self.download(file_format)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], content_type)
+                self.assertIn(line, response.body.decode())
+
+    def test_unknown_format(self):
+        response = self.download('xml')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('format', response.json())
+
+    def test_not_modified(self):
+        etag = self.download()['ETag']
+        response = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertNotEqual(self.download('csv')['ETag'], etag)
+
+    def test_compressed_weak_etag(self):
+        response = self.download(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        response = self.download(
+            HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.download(
+            HTTP_IF_NONE_MATCH=etag[2:]).status_code, 304)
+
+    def test_changed_list(self):
+        pie = Recipe.objects.create(
+            author=self.author, name='Пирог', text='Описание',
+            cooking_time=60, image='recipes/images/pie.png'
+        )
+        RecipeIngredient.objects.create(
+            recipe=pie, ingredient=self.salt, amount=5)
+        etag = self.download()['ETag']
+        for change in (
+            lambda: self.add_to_cart(pie),
+            lambda: self.update_recipe(((self.flour, 300),)),
+        ):
+            change()
+            response = self.download(HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+
+
+class FastJSONRendererTest(SimpleTestCase):
+    """FastJSONRenderer выводит те же байты, что и JSONRenderer."""
+
+    def test_same_output(self):
+        for data in (
+            {'name': 'Блины\u2028с медом', 'tags': [1, 2], 'author': None},
+            [{'pub_date': datetime(2024, 1, 2, 3, 4, 5), 'ok': True}],
+            {'similarity': [0.4286, 1 / 3, -0.0], 'amount': Decimal('1.50')},
+            [],
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(
+                    FastJSONRenderer().render(data),
+                    JSONRenderer().render(data)
+                )
+
+    def test_exponent(self):
+        self.assertEqual(
+            json.loads(FastJSONRenderer().render([1e-07, 1e+20])),
+            [1e-07, 1e+20]
+        )
+
+    def test_non_finite_floats(self):
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    FastJSONRenderer().render({'items': [{'value': value}]})
+
+
+class IngredientSearchTest(TestCase):
+    """Поиск ингредиентов с ограничением limit."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('мука', 'мука ржаная', 'молоко'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def search(self, **params):
+        return self.client.get('/api/ingredients/', {'name': 'му', **params})
+
+    def test_limit(self):
+        self.assertEqual(len(self.search().json()), 2)
+        self.assertEqual(
+            [item['name'] for item in self.search(limit=1).json()], ['мука'])
+
+    def test_invalid_limit(self):
+        for limit in ('0', '-1', 'abc'):
+            with self.subTest(limit=limit):
+                response = self.search(limit=limit)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('limit', response.json())
+
+
+class TagFilterTest(TestCase):
+    """Фильтр по тэгам принимает тэги, созданные в других процессах."""
+
+    def test_new_tag(self):
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.assertEqual(
+            self.client.get('/api/recipes/?tags=breakfast').status_code, 200)
+        # bulk_create не отправляет сигналы, как сохранение тэга в другом
+        # процессе.
+        Tag.objects.bulk_create([Tag(name='Ужин', slug='dinner')])
+        self.assertEqual(self.client.get(
+            '/api/recipes/?tags=breakfast&tags=dinner').status_code, 200)
+        self.assertEqual(
+            self.client.get('/api/recipes/?tags=unknown').status_code, 400)
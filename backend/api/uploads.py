@@ -0,0 +1,27 @@
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+
+from foodgram.constants import MAX_UPLOAD_SIZE
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Запись загружаемого файла на диск по частям с ограничением размера.
+
+    Размер проверяется по мере получения данных, поэтому слишком большой
+    файл отклоняется, не будучи прочитанным целиком.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > MAX_UPLOAD_SIZE:
+            raise MultiPartParserError(
+                f'Размер файла превышает {MAX_UPLOAD_SIZE // 1024 // 1024} Мб'
+            )
+        return super().receive_data_chunk(raw_data, start)
+
+
+class StreamingUploadMixin:
+    """Потоковая загрузка файлов из multipart-запросов."""
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [LimitedTemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
@@ -1,34 +1,50 @@
+from itertools import chain
+
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
+from rest_framework.utils.urls import replace_query_param
 
-from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPagination
+from .exports import SHOPPING_LIST_FORMATS, shopping_list_item
+from .fast_serializers import RecipeFastReadSerializer
+from .filters import RecipeFilter
+from .pagination import CustomPagination, RecipeCursorPagination
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (
     AvatarSerializer, CustomUserSerializer, FavoriteSerializer,
-    IngredientSerializer, LinkSerializers, RecipeReadSerializer,
-    RecipeWriteSerializer, ShoppingCartSerializer, SubscribeReadSerializer,
-    SubscribeWriteSerializer, TagSerializer
+    IngredientSerializer, LinkSerializers, PantrySerializer,
+    RecipeReadSerializer, RecipeWriteSerializer, ShoppingCartSerializer,
+    SubscribeReadSerializer, SubscribeWriteSerializer, TagSerializer
 )
+from .uploads import StreamingUploadMixin
+from foodgram.metrics import timer
+from recipes import feed, shopping_list
+from recipes.catalog import ingredient_catalog
+from recipes.counters import change_counter
+from recipes.index import recipe_index
 from recipes.models import (
-    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Subscribe,
-    Tag
+    Favorite, Ingredient, Recipe, ShoppingCart, Subscribe, Tag
 )
+from recipes.units import normalize
 
 
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(StreamingUploadMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [AllowAny]
@@ -63,14 +79,22 @@ class CustomUserViewSet(UserViewSet):
             context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=request.user)
+        with transaction.atomic():
+            serializer.save(user=request.user)
+            change_counter(User, author.id, 'subscribers_count', 1)
+            feed.backfill(request.user, author)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
     def delete_subscribe(self, request, **kwargs):
-        deleted_subscriptions_count, _ = Subscribe.objects.filter(
-            user=request.user, author=self.get_object()
-        ).delete()
+        author = self.get_object()
+        with transaction.atomic():
+            deleted_subscriptions_count, _ = Subscribe.objects.filter(
+                user=request.user, author=author
+            ).delete()
+            if deleted_subscriptions_count:
+                change_counter(User, author.id, 'subscribers_count', -1)
+                feed.drop(request.user, author)
         if not deleted_subscriptions_count:
             return Response(
                 {"errors": "Вы не были подписаны на этого пользователя"},
@@ -87,14 +111,34 @@ class CustomUserViewSet(UserViewSet):
         user = request.user
         queryset = User.objects.filter(subscribing__user=user)
         pages = self.paginate_queryset(queryset)
+        recipes = Recipe.objects.all()
+        limit = request.query_params.get('recipes_limit')
+        if limit:
+            try:
+                limit = int(limit)
+                if limit < 1:
+                    raise ValueError
+            except ValueError:
+                raise ValidationError({
+                    'recipes_limit': 'Укажите целое число не меньше 1.'
+                })
+            if pages:
+                recipes = Recipe.objects.latest_per_author(pages, limit)
+        prefetch_related_objects(
+            pages,
+            Prefetch('recipes', queryset=recipes, to_attr='latest_recipes')
+        )
         serializer = SubscribeReadSerializer(
             pages, many=True, context={'request': request})
-        return self.get_paginated_response(serializer.data)
+        with timer('serializer'):
+            data = serializer.data
+        return self.get_paginated_response(data)
 
     @action(
         detail=False,
         methods=['put'],
         permission_classes=[IsAuthenticated],
+        parser_classes=(JSONParser, MultiPartParser, FormParser),
         url_path='me/avatar'
     )
     def avatar(self, request, **kwargs):
@@ -108,16 +152,89 @@ class CustomUserViewSet(UserViewSet):
 
     @avatar.mapping.delete
     def delete_avatar(self, request, **kwargs):
-        User.objects.filter(id=self.request.user.id).update(avatar=None)
+        User.objects.filter(id=self.request.user.id).update(
+            avatar=None, avatar_variants={})
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(StreamingUploadMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthorOrReadOnly, AllowAny]
     pagination_class = CustomPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
+
+    @property
+    def paginator(self):
+        """Пагинация по курсору включается параметром pagination=cursor."""
+        if self.request.query_params.get('pagination') == 'cursor':
+            self.pagination_class = RecipeCursorPagination
+        return super().paginator
+
+    def get_recipe_fields(self):
+        """Поля рецепта из параметров fields или view=card.
+
+        None означает полное представление рецепта.
+        """
+        if self.request.query_params.get('view') == 'card':
+            return RecipeReadSerializer.Meta.card_fields
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        fields = tuple(
+            name.strip() for name in fields.split(',') if name.strip())
+        if not fields:
+            raise ValidationError({'fields': 'Укажите хотя бы одно поле.'})
+        unknown = set(fields) - set(RecipeReadSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError(
+                {'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}'}
+            )
+        return fields
+
+    def get_queryset(self):
+        queryset = Recipe.objects.all()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        fields = self.get_recipe_fields()
+        if fields is None:
+            return queryset.with_user_flags(self.request.user).with_related()
+        if {'is_favorited', 'is_in_shopping_cart'} & set(fields):
+            queryset = queryset.with_user_flags(self.request.user)
+        sources = {
+            'image_variants' if name == 'images' else name for name in fields
+        }
+        columns = sources & {
+            field.name for field in Recipe._meta.concrete_fields}
+        return queryset.with_related(sources).only('id', 'pub_date', *columns)
+
+    def get_read_serializer(self, instance, many=False):
+        """Быстрый сериализатор для чтения рецептов."""
+        return RecipeFastReadSerializer(
+            instance,
+            many=many,
+            context=self.get_serializer_context(),
+            fields=self.get_recipe_fields()
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_read_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_read_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_read_serializer(self.get_object())
+        return Response(serializer.data)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            kwargs.setdefault('fields', self.get_recipe_fields())
+        return super().get_serializer(*args, **kwargs)
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
@@ -128,19 +245,44 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return ShoppingCartSerializer
         return RecipeWriteSerializer
 
-    def add_to(self, model, user, pk):
+    def perform_content_negotiation(self, request, force=False):
+        """Параметр format выгрузки списка покупок задает формат файла.
+
+        Для него не ищется рендерер, ошибки возвращаются в JSON.
+        """
+        return super().perform_content_negotiation(
+            request,
+            force=force or self.action == 'download_shopping_cart'
+        )
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            shopping_list.delete_recipe(instance.id)
+            instance.delete()
+            change_counter(User, instance.author_id, 'recipes_count', -1)
+
+    def add_to(self, model, user, pk, counter):
         """Метод для добавления рецепта в избранное или в список покупок."""
         serializer = self.get_serializer(data={'recipe': pk})
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=user)
+        with transaction.atomic():
+            serializer.save(user=user)
+            change_counter(Recipe, pk, counter, 1)
+            if model is ShoppingCart:
+                shopping_list.add_recipe(user.id, pk)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def delete_from(self, model, user, pk, error_message=''):
+    def delete_from(self, model, user, pk, counter, error_message=''):
         """Метод для удаления рецепта из избранного или из списка покупок."""
         recipe = get_object_or_404(Recipe, id=pk)
-        deleted_model_count, _ = model.objects.filter(
-            user=user, recipe=recipe
-        ).delete()
+        with transaction.atomic():
+            deleted_model_count, _ = model.objects.filter(
+                user=user, recipe=recipe
+            ).delete()
+            if deleted_model_count:
+                change_counter(Recipe, recipe.id, counter, -1)
+                if model is ShoppingCart:
+                    shopping_list.remove_recipe(user.id, recipe.id)
         if not deleted_model_count:
             return Response(
                 {
@@ -160,7 +302,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def favorite(self, request, **kwargs):
         """Метод для добавления рецепта в избранное и удаления из него."""
         return self.add_to(
-            model=Favorite, user=request.user, pk=self.kwargs.get('pk'))
+            model=Favorite,
+            user=request.user,
+            pk=self.kwargs.get('pk'),
+            counter='favorites_count')
 
     @favorite.mapping.delete
     def delete_favorite(self, request, **kwargs):
@@ -168,6 +313,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             model=Favorite,
             user=request.user,
             pk=self.kwargs.get('pk'),
+            counter='favorites_count',
             error_message='избранных рецептов')
 
     @action(
@@ -178,7 +324,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def shopping_cart(self, request, **kwargs):
         """Метод для добавления рецепта в список покупок и удаления из него."""
         return self.add_to(
-            model=ShoppingCart, user=request.user, pk=self.kwargs.get('pk'))
+            model=ShoppingCart,
+            user=request.user,
+            pk=self.kwargs.get('pk'),
+            counter='shopping_cart_count')
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, **kwargs):
@@ -186,40 +335,134 @@ class RecipeViewSet(viewsets.ModelViewSet):
             model=ShoppingCart,
             user=request.user,
             pk=self.kwargs.get('pk'),
+            counter='shopping_cart_count',
             error_message='покупок')
 
+    def get_recipes(self, ids):
+        """Рецепты с данными для чтения в порядке ids."""
+        recipes = Recipe.objects.with_user_flags(
+            self.request.user).with_related().in_bulk(ids)
+        return [
+            recipes[recipe_id] for recipe_id in ids if recipe_id in recipes
+        ]
+
+    @action(
+        detail=True,
+        methods=['get'],
+        permission_classes=[AllowAny]
+    )
+    def similar(self, request, pk=None):
+        """Метод для рецептов с похожими ингредиентами и тэгами."""
+        recipe = get_object_or_404(Recipe, pk=pk)
+        limit = CustomPagination().get_page_size(request)
+        scores = dict(recipe_index.similar(recipe.id, limit))
+        recipes = self.get_recipes(list(scores))
+        data = self.get_read_serializer(recipes, many=True).data
+        for item, recipe in zip(data, recipes):
+            item['similarity'] = round(scores[recipe.id], 4)
+        return Response(data)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[AllowAny]
+    )
+    def pantry(self, request):
+        """Метод для подбора рецептов по имеющимся ингредиентам."""
+        serializer = PantrySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ingredients = serializer.validated_data['ingredients']
+        matches = recipe_index.pantry(
+            ingredients, serializer.validated_data['max_missing'])
+        paginator = CustomPagination()
+        page = paginator.paginate_queryset(matches, request, view=self)
+        recipes = self.get_recipes([recipe_id for recipe_id, _, _ in page])
+        coverage = {recipe_id: coverage for recipe_id, coverage, _ in page}
+        data = self.get_read_serializer(recipes, many=True).data
+        for item, recipe in zip(data, recipes):
+            item['coverage'] = round(coverage[recipe.id], 4)
+            item['missing_ingredients'] = recipe_index.missing(
+                recipe.id, ingredients)
+        return paginator.get_paginated_response(data)
+
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        """Метод для ленты рецептов авторов, на которых подписан пользователь.
+
+        Страницы выбираются по курсору из параметра cursor.
+        """
+        cursor = request.query_params.get('cursor')
+        try:
+            position = feed.decode_cursor(cursor) if cursor else None
+        except ValueError as error:
+            raise NotFound(error)
+        limit = RecipeCursorPagination().get_page_size(request)
+        ids, next_position = feed.feed_page(request.user, limit, position)
+        serializer = self.get_read_serializer(
+            self.get_recipes(ids), many=True)
+        next_url = None
+        if next_position is not None:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'cursor',
+                feed.encode_cursor(next_position)
+            )
+        return Response({'next': next_url, 'results': serializer.data})
+
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_list(self, request):
+        """Метод для получения списка покупок в общих единицах измерения."""
+        return Response([
+            shopping_list_item(item)
+            for item in normalize(shopping_list.user_items(request.user))
+        ])
+
     @action(
         detail=False,
         permission_classes=[IsAuthenticated]
     )
     def download_shopping_cart(self, request):
-        """Метод для скачивания списка покупок."""
+        """Метод для скачивания списка покупок.
+
+        Формат файла задается параметром format: txt, csv или json.
+        ETag зависит от версии списка покупок пользователя, поэтому
+        повторное скачивание неизмененного списка возвращает 304 без
+        обращения к списку покупок.
+        """
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            raise ValidationError({
+                'format': (
+                    f'Допустимые форматы: '
+                    f'{", ".join(SHOPPING_LIST_FORMATS)}'
+                )
+            })
         user = request.user
-        if not user.shopping_cart.exists():
+        etag = quote_etag(
+            f'{user.id}-{user.shopping_cart_version}-{file_format}')
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response['ETag'] = etag
+            return response
+        items = normalize(shopping_list.user_items(user).iterator())
+        first = next(items, None)
+        if first is None:
             return Response(
                 {'errors': 'Список покупок пуст'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        shopping_list = []
-        for ingredient in ingredients:
-            shopping_list.append(
-                (
-                    f'- {ingredient["ingredient__name"]} '
-                    f'({ingredient["ingredient__measurement_unit"]}) '
-                    f'- {ingredient["amount"]}'
-                )
-            )
-        response = HttpResponse(
-            '\n'.join(shopping_list), content_type='text.txt'
-        )
+        content_type, export = SHOPPING_LIST_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            export(chain((first,), items)), content_type=content_type)
         response['Content-Disposition'] = (
-            'attachment; filename=shopping_list.txt')
+            f'attachment; filename=shopping_list.{file_format}')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
         return response
 
     @action(
@@ -246,8 +489,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
+
+    def list(self, request, *args, **kwargs):
+        """Поиск ингредиентов по названию без обращения к БД."""
+        limit = request.query_params.get('limit')
+        if limit:
+            try:
+                limit = int(limit)
+                if limit < 1:
+                    raise ValueError
+            except ValueError:
+                raise ValidationError(
+                    {'limit': 'Укажите целое число не меньше 1.'})
+        else:
+            limit = None
+        return Response(ingredient_catalog.search(
+            request.query_params.get('name', ''), limit))
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
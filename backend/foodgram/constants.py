@@ -11,3 +11,27 @@ TAG_LENGTH = 32
 LINK_LENGTH = 6
 MAX_LINK_LENGTH = 10
 PAGINATION_PAGE_SIZE = 6
+CATALOG_TTL = 300
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1600, 1600),
+}
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANTS_POLL_INTERVAL = 5
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+COMPRESSION_MIN_SIZE = 1024
+BROTLI_QUALITY = 5
+PROFILES_LIMIT = 50
+PROFILE_STATS_LIMIT = 40
+FEED_FANOUT_LIMIT = 1000
+FEED_BATCH_SIZE = 1000
+RECIPE_INDEX_TTL = 3600
+RECIPE_INDEX_SYNC_LIMIT = 500
+RECIPE_INDEX_GAP_WINDOW = 100
+RECIPE_INDEX_CHANGES_RETENTION = 3 * RECIPE_INDEX_TTL
+RECIPE_INDEX_PRUNE_EVERY = 100
+SIMILAR_INGREDIENT_WEIGHT = 0.8
+SIMILAR_TAG_WEIGHT = 0.2
+PANTRY_MAX_MISSING = 2
+SHOPPING_LIST_BATCH_SIZE = 1000
@@ -0,0 +1,174 @@
+"""Метрики запросов: время ответа, SQL-запросы, сериализация и рендеринг.
+
+Метрики собирает MetricsMiddleware. Гистограммы хранятся в памяти
+процесса, поэтому каждый воркер gunicorn отдает на /metrics свои данные.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+HISTOGRAMS = (
+    (
+        'foodgram_request_duration_seconds',
+        'Время обработки запроса.',
+        'total', DURATION_BUCKETS
+    ),
+    (
+        'foodgram_db_duration_seconds',
+        'Суммарное время SQL-запросов за запрос.',
+        'db', DURATION_BUCKETS
+    ),
+    (
+        'foodgram_db_queries',
+        'Число SQL-запросов за запрос.',
+        'queries', QUERIES_BUCKETS
+    ),
+    (
+        'foodgram_serializer_duration_seconds',
+        'Время сериализации ответа.',
+        'serializer', DURATION_BUCKETS
+    ),
+    (
+        'foodgram_render_duration_seconds',
+        'Время рендеринга ответа.',
+        'render', DURATION_BUCKETS
+    ),
+)
+
+current_request = ContextVar('current_request', default=None)
+
+
+class RequestMetrics:
+    """Замеры одного запроса.
+
+    Экземпляр передается в connection.execute_wrapper и считает
+    количество и время SQL-запросов.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.timings = {'db': 0.0, 'serializer': 0.0, 'render': 0.0}
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.timings['db'] += time.perf_counter() - start
+            self.queries += 1
+
+    def finish(self):
+        self.timings['total'] = time.perf_counter() - self.start
+        self.timings['app'] = max(
+            self.timings['total'] - self.timings['db']
+            - self.timings['serializer'] - self.timings['render'],
+            0
+        )
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing в миллисекундах."""
+        return ', '.join(
+            f'{name};dur={self.timings[name] * 1000:.2f}'
+            + (f';desc="{self.queries} queries"' if name == 'db' else '')
+            for name in ('db', 'serializer', 'render', 'app', 'total')
+        )
+
+
+@contextmanager
+def timer(name):
+    """Добавление времени блока к замеру name текущего запроса."""
+    metrics = current_request.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - start
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    """Гистограммы метрик по представлениям."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, view, metrics):
+        values = dict(metrics.timings, queries=metrics.queries)
+        with self.lock:
+            for name, _, key, buckets in HISTOGRAMS:
+                histogram = self.histograms.get((name, view))
+                if histogram is None:
+                    histogram = self.histograms[(name, view)] = Histogram(
+                        buckets)
+                histogram.observe(values[key])
+
+    def export(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        with self.lock:
+            for name, description, _, _ in HISTOGRAMS:
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view), histogram in sorted(
+                        self.histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(
+                            histogram.buckets, histogram.counts):
+                        lines.append(
+                            f'{name}_bucket{{view="{view}",le="{bound}"}} '
+                            f'{count}'
+                        )
+                    lines.append(
+                        f'{name}_bucket{{view="{view}",le="+Inf"}} '
+                        f'{histogram.count}'
+                    )
+                    lines.append(
+                        f'{name}_sum{{view="{view}"}} {histogram.sum}')
+                    lines.append(
+                        f'{name}_count{{view="{view}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def view_name(request):
+    """Имя представления и действия, например RecipeViewSet.list."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view = match.func
+    view_class = getattr(view, 'cls', None) or getattr(
+        view, 'view_class', None)
+    if view_class is None:
+        return match.view_name
+    actions = getattr(view, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{view_class.__name__}.{action}'
+    return f'{view_class.__name__}.{request.method.lower()}'
@@ -0,0 +1,110 @@
+import re
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+from foodgram import metrics
+from foodgram.constants import BROTLI_QUALITY, COMPRESSION_MIN_SIZE
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class CompressionMiddleware:
+    """Сжатие ответов brotli или gzip в зависимости от Accept-Encoding.
+
+    Сжимаются только ответы больше COMPRESSION_MIN_SIZE байт. Brotli
+    используется, если пакет установлен и клиент его поддерживает.
+    Потоковые ответы сжимаются gzip.
+    """
+
+    accepts_brotli = re.compile(r'\bbr\b')
+    accepts_gzip = re.compile(r'\bgzip\b')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding'):
+            return response
+        if (
+            not response.streaming
+            and len(response.content) < COMPRESSION_MIN_SIZE
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if response.streaming:
+            if not self.accepts_gzip.search(accept_encoding):
+                return response
+            response.streaming_content = compress_sequence(
+                response.streaming_content)
+            del response['Content-Length']
+            encoding = 'gzip'
+        else:
+            if brotli and self.accepts_brotli.search(accept_encoding):
+                encoding = 'br'
+                content = brotli.compress(
+                    response.content, quality=BROTLI_QUALITY)
+            elif self.accepts_gzip.search(accept_encoding):
+                encoding = 'gzip'
+                content = compress_string(response.content)
+            else:
+                return response
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class MetricsMiddleware:
+    """Замеры времени и SQL-запросов каждого запроса.
+
+    Добавляет заголовок Server-Timing и накапливает гистограммы по
+    представлениям, которые отдаются на METRICS_PATH только адресам из
+    METRICS_ALLOWED_IPS. При METRICS_ENABLED=False не подключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path == settings.METRICS_PATH:
+            return self.export(request)
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_request.set(request_metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(request_metrics))
+                response = self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+        request_metrics.finish()
+        metrics.registry.observe(metrics.view_name(request), request_metrics)
+        response['Server-Timing'] = request_metrics.server_timing()
+        return response
+
+    def export(self, request):
+        if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+            raise Http404
+        return HttpResponse(
+            metrics.registry.export(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
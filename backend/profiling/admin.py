@@ -0,0 +1,55 @@
+from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created', 'method', 'path', 'view', 'duration')
+    list_filter = ('view',)
+    search_fields = ('path', 'view')
+    fields = (
+        'created', 'method', 'path', 'view', 'duration', 'download',
+        'summary'
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='profiling_requestprofile_download'
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        """Файл профиля для pstats, snakeviz и подобных инструментов."""
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(
+            bytes(profile.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = (
+            f'attachment; filename=profile-{profile.pk}.prof')
+        return response
+
+    @admin.display(description='Файл профиля')
+    def download(self, obj):
+        url = reverse(
+            'admin:profiling_requestprofile_download', args=(obj.pk,))
+        return format_html('<a href="{}">profile-{}.prof</a>', url, obj.pk)
+
+    @admin.display(description='Самые затратные функции')
+    def summary(self, obj):
+        return format_html('<pre>{}</pre>', obj.summary())
@@ -0,0 +1,67 @@
+import cProfile
+import hmac
+import marshal
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .models import RequestProfile
+from foodgram.constants import PROFILES_LIMIT
+from foodgram.metrics import view_name
+
+
+class ProfilingMiddleware:
+    """Профилирование запросов через cProfile.
+
+    Профилируется запрос с заголовком X-Profile-Token, равным
+    PROFILING_TOKEN, и случайная доля PROFILING_SAMPLE_RATE остальных
+    запросов. Сохраняются профили запросов по токену и сэмплированных
+    запросов дольше PROFILING_SLOW_REQUEST секунд, в БД остаются
+    последние PROFILES_LIMIT профилей.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_TOKEN and not settings.PROFILING_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def requested(self, request):
+        token = request.META.get('HTTP_X_PROFILE_TOKEN')
+        return bool(
+            token and settings.PROFILING_TOKEN
+            and hmac.compare_digest(token, settings.PROFILING_TOKEN)
+        )
+
+    def __call__(self, request):
+        requested = self.requested(request)
+        if not requested and random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - start
+        if requested or duration >= settings.PROFILING_SLOW_REQUEST:
+            profile = self.save(request, profiler, duration)
+            response['X-Profile-Id'] = str(profile.id)
+        return response
+
+    def save(self, request, profiler, duration):
+        profiler.create_stats()
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=request.get_full_path(),
+            view=view_name(request),
+            duration=duration,
+            stats=marshal.dumps(profiler.stats)
+        )
+        outdated = list(RequestProfile.objects.values_list(
+            'id', flat=True)[PROFILES_LIMIT:])
+        if outdated:
+            RequestProfile.objects.filter(id__in=outdated).delete()
+        return profile
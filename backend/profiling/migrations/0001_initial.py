@@ -0,0 +1,31 @@
+# Generated by Django 3.2.16 on 2026-10-17 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата запроса')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.TextField(verbose_name='Адрес')),
+                ('view', models.CharField(max_length=256, verbose_name='Представление')),
+                ('duration', models.FloatField(verbose_name='Время выполнения, с')),
+                ('stats', models.BinaryField(verbose_name='Статистика cProfile')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ('-created', '-id'),
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+import io
+import marshal
+import pstats
+
+from django.db import models
+
+from foodgram.constants import PROFILE_STATS_LIMIT
+
+
+class StoredStats:
+    """Статистика cProfile из БД в виде, который принимает pstats.Stats."""
+
+    def __init__(self, data):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
+
+
+class RequestProfile(models.Model):
+    """Профиль cProfile одного запроса."""
+    created = models.DateTimeField(
+        verbose_name='Дата запроса',
+        auto_now_add=True,
+        db_index=True
+    )
+    method = models.CharField(
+        verbose_name='Метод',
+        max_length=10
+    )
+    path = models.TextField(
+        verbose_name='Адрес'
+    )
+    view = models.CharField(
+        verbose_name='Представление',
+        max_length=256
+    )
+    duration = models.FloatField(
+        verbose_name='Время выполнения, с'
+    )
+    stats = models.BinaryField(
+        verbose_name='Статистика cProfile'
+    )
+
+    class Meta:
+        ordering = ('-created', '-id')
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration:.3f} с)'
+
+    def summary(self, sort='cumulative', limit=PROFILE_STATS_LIMIT):
+        """Самые затратные функции в текстовом виде pstats."""
+        stream = io.StringIO()
+        stats = pstats.Stats(StoredStats(bytes(self.stats)), stream=stream)
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
@@ -53,7 +53,7 @@ class RecipeAdmin(admin.ModelAdmin):
     @admin.display(description='Общее число добавлений рецепта в избранное.')
     def favorite_count(self, recipe):
         """Количество рецепта в избранном."""
-        return recipe.favorites.count()
+        return recipe.favorites_count
 
 
 @admin.register(Favorite, ShoppingCart)
@@ -1,7 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        from . import catalog, index  # noqa: F401
+        from .search import create_sqlite_search_index
+        post_migrate.connect(create_sqlite_search_index, sender=self)
@@ -0,0 +1,18 @@
+"""Вставка записей из генераторов пачками."""
+from itertools import islice
+
+
+def bulk_insert(model, objects, batch_size):
+    """Вставка объектов из генератора пачками batch_size.
+
+    Записи, нарушающие ограничения уникальности, пропускаются. Возвращает
+    число переданных объектов.
+    """
+    objects = iter(objects)
+    count = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return count
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+        count += len(batch)
@@ -0,0 +1,118 @@
+"""Справочники ингредиентов и тэгов в памяти процесса."""
+import bisect
+import time
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram.constants import CATALOG_TTL
+from .models import Ingredient, Tag
+
+
+class Catalog:
+    """Справочник, загружаемый из БД при первом обращении.
+
+    Сбрасывается при изменении записей в этом процессе и перестраивается
+    не реже одного раза в ttl секунд, чтобы подхватить изменения из других
+    процессов.
+    """
+
+    def __init__(self, ttl=CATALOG_TTL):
+        self.ttl = ttl
+        self._index = None
+
+    def invalidate(self):
+        self._index = None
+
+    def build(self):
+        raise NotImplementedError
+
+    def get_index(self):
+        index = self._index
+        if index is None or time.monotonic() - index[1] > self.ttl:
+            index = self._index = (self.build(), time.monotonic())
+        return index[0]
+
+
+class IngredientCatalog(Catalog):
+    """Отсортированный по названию список ингредиентов для автодополнения."""
+
+    def build(self):
+        items = [
+            {
+                'id': ingredient['id'],
+                'name': ingredient['name'],
+                'measurement_unit': ingredient['measurement_unit'],
+            }
+            for ingredient in Ingredient.objects.order_by(
+                'name', 'measurement_unit'
+            ).values('id', 'name', 'measurement_unit')
+        ]
+        items.sort(key=lambda item: (item['name'].casefold(), item['name']))
+        keys = [item['name'].casefold() for item in items]
+        return keys, items
+
+    def search(self, query='', limit=None):
+        """Ингредиенты, название которых содержит query.
+
+        Сначала идут совпадения по началу названия, затем остальные
+        совпадения по подстроке. Регистр не учитывается.
+        """
+        keys, items = self.get_index()
+        query = query.casefold()
+        if not query:
+            return items[:limit]
+        start = bisect.bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        result = items[start:end]
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+        for position, key in enumerate(keys):
+            if query in key and not start <= position < end:
+                result.append(items[position])
+                if len(result) == limit:
+                    break
+        return result
+
+
+class TagCatalog(Catalog):
+    """Соответствие слагов тэгов их id."""
+
+    def build(self):
+        return dict(Tag.objects.order_by().values_list('slug', 'id'))
+
+    def choices(self):
+        return [(slug, slug) for slug in self.get_index()]
+
+    def contains(self, slug):
+        """Есть ли тэг со слагом slug.
+
+        Тэги создаются через админку, поэтому для неизвестного слага
+        справочник перечитывается: тэг мог появиться в другом процессе.
+        """
+        if slug in self.get_index():
+            return True
+        self.invalidate()
+        return slug in self.get_index()
+
+    def get_ids(self, slugs):
+        index = self.get_index()
+        return [index[slug] for slug in slugs if slug in index]
+
+
+ingredient_catalog = IngredientCatalog()
+tag_catalog = TagCatalog()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_catalog(**kwargs):
+    ingredient_catalog.invalidate()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_catalog(**kwargs):
+    tag_catalog.invalidate()
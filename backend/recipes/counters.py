@@ -0,0 +1,57 @@
+"""Счетчики избранного, списков покупок, рецептов и подписчиков."""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Favorite, Recipe, ShoppingCart, Subscribe
+
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscribe, 'author'),
+)
+
+
+def change_counter(model, pk, counter, delta):
+    """Атомарное изменение счетчика на delta.
+
+    Счетчик не опускается ниже нуля, даже если он отстал от данных,
+    например после добавления записей через админку.
+    """
+    model.objects.filter(pk=pk).update(
+        **{counter: Greatest(F(counter) + delta, 0)})
+
+
+def actual_count(related_model, field):
+    """Подзапрос с фактическим числом связанных записей."""
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def reconcile_counters():
+    """Исправление расхождений счетчиков с фактическими данными.
+
+    Возвращает число исправленных записей для каждого счетчика.
+    """
+    fixed = {}
+    with transaction.atomic():
+        for model, counter, related_model, field in COUNTERS:
+            actual = actual_count(related_model, field)
+            drifted = model.objects.annotate(actual=actual).exclude(
+                **{counter: F('actual')}).values('pk')
+            fixed[f'{model.__name__}.{counter}'] = model.objects.filter(
+                pk__in=drifted).update(**{counter: actual})
+    return fixed
@@ -0,0 +1,181 @@
+"""Лента рецептов авторов, на которых подписан пользователь.
+
+Рецепты авторов, у которых не больше FEED_FANOUT_LIMIT подписчиков,
+при публикации записываются в ленты подписчиков (FeedEntry) и
+отмечаются in_feeds. Рецепты более популярных авторов не рассылаются.
+Неразосланные рецепты, в том числе созданные в обход API или
+оставшиеся у автора, число подписчиков которого опустилось до
+FEED_FANOUT_LIMIT, выбираются при чтении ленты по частичному индексу
+recipe_author_pull_feed_idx: не больше страницы для каждого автора.
+Все выборки сливаются по (pub_date, id). Команда rebuild_feeds
+рассылает такие рецепты, чтобы их не нужно было выбирать при чтении.
+"""
+import base64
+import heapq
+from datetime import datetime
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .bulk import bulk_insert
+from .models import FeedEntry, Recipe, Subscribe
+from foodgram.constants import FEED_BATCH_SIZE, FEED_FANOUT_LIMIT
+
+
+def insert_entries(entries):
+    """Вставка записей ленты из генератора пачками."""
+    bulk_insert(FeedEntry, entries, FEED_BATCH_SIZE)
+
+
+def fan_out(recipe):
+    """Запись нового рецепта в ленты подписчиков автора.
+
+    Рецепты авторов с числом подписчиков больше FEED_FANOUT_LIMIT
+    не рассылаются и читаются из таблицы рецептов.
+    """
+    if recipe.author.subscribers_count > FEED_FANOUT_LIMIT:
+        return
+    subscribers = Subscribe.objects.filter(
+        author_id=recipe.author_id).values_list('user_id', flat=True)
+    insert_entries(
+        FeedEntry(
+            user_id=user_id,
+            recipe_id=recipe.id,
+            author_id=recipe.author_id,
+            pub_date=recipe.pub_date
+        )
+        for user_id in subscribers.iterator()
+    )
+    Recipe.objects.filter(id=recipe.id).update(in_feeds=True)
+
+
+def fan_out_author(author_id):
+    """Рассылка всех еще не разосланных рецептов автора.
+
+    Нужна для рецептов, созданных в обход API или до появления лент.
+    Возвращает число разосланных рецептов.
+    """
+    with transaction.atomic():
+        recipes = list(Recipe.objects.filter(
+            author_id=author_id, in_feeds=False
+        ).values_list('id', 'pub_date'))
+        subscribers = list(Subscribe.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True))
+        insert_entries(
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date
+            )
+            for recipe_id, pub_date in recipes
+            for user_id in subscribers
+        )
+        return Recipe.objects.filter(
+            author_id=author_id, in_feeds=False).update(in_feeds=True)
+
+
+def backfill(user, author):
+    """Добавление разосланных рецептов автора в ленту нового подписчика."""
+    recipes = Recipe.objects.filter(
+        author=author, in_feeds=True).values_list('id', 'pub_date')
+    insert_entries(
+        FeedEntry(
+            user_id=user.id,
+            recipe_id=recipe_id,
+            author_id=author.id,
+            pub_date=pub_date
+        )
+        for recipe_id, pub_date in recipes.iterator()
+    )
+
+
+def drop(user, author):
+    """Удаление рецептов автора из ленты отписавшегося пользователя."""
+    FeedEntry.objects.filter(user=user, author=author).delete()
+
+
+def encode_cursor(position):
+    pub_date, recipe_id = position
+    return base64.urlsafe_b64encode(
+        f'{pub_date.isoformat()}|{recipe_id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Позиция (pub_date, id) из курсора, ValueError для неверного."""
+    try:
+        pub_date, recipe_id = base64.urlsafe_b64decode(
+            cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(pub_date), int(recipe_id)
+    except (TypeError, UnicodeError, ValueError):
+        raise ValueError(f'Неверный курсор: {cursor}')
+
+
+def before(queryset, cursor, id_field):
+    """Записи после позиции cursor в порядке (-pub_date, -id)."""
+    if cursor is None:
+        return queryset
+    pub_date, recipe_id = cursor
+    return queryset.filter(pub_date__lte=pub_date).filter(
+        Q(pub_date__lt=pub_date)
+        | Q(pub_date=pub_date, **{f'{id_field}__lt': recipe_id})
+    )
+
+
+def pulled_recipes(user, limit, cursor=None):
+    """Позиции неразосланных рецептов авторов пользователя.
+
+    Для каждого автора, у которого есть рецепты с in_feeds=False,
+    выбирается не больше limit рецептов, поэтому время выборки зависит
+    от числа таких авторов, а не от числа их рецептов. Если СУБД
+    поддерживает LIMIT в частях UNION, выборка выполняется одним
+    запросом. Возвращает отсортированные по убыванию списки позиций.
+    """
+    authors = Subscribe.objects.filter(user=user).filter(Exists(
+        Recipe.objects.filter(author_id=OuterRef('author_id'), in_feeds=False)
+    )).values_list('author_id', flat=True)
+    querysets = [
+        before(
+            Recipe.objects.filter(author_id=author_id, in_feeds=False),
+            cursor, 'id'
+        ).order_by('-pub_date', '-id').values_list('pub_date', 'id')[:limit]
+        for author_id in authors
+    ]
+    if len(querysets) > 1 and (
+        connection.features.supports_slicing_ordering_in_compound
+    ):
+        querysets = [querysets[0].union(*querysets[1:], all=True)]
+    return [sorted(queryset, reverse=True) for queryset in querysets]
+
+
+def feed_page(user, limit, cursor=None):
+    """Id рецептов страницы ленты и позиция следующей страницы.
+
+    Из ленты пользователя и из неразосланных рецептов каждого
+    автора выбирается не больше limit + 1 записей.
+    """
+    timeline = before(
+        FeedEntry.objects.filter(user=user), cursor, 'recipe_id'
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id')[:limit + 1]
+    positions = list(islice(
+        heapq.merge(
+            timeline, *pulled_recipes(user, limit + 1, cursor), reverse=True
+        ),
+        limit + 1
+    ))
+    next_position = positions[limit - 1] if len(positions) > limit else None
+    return [recipe_id for _, recipe_id in positions[:limit]], next_position
+
+
+def rebuild_feeds():
+    """Рассылка рецептов авторов, у которых подписчиков не больше лимита.
+
+    Возвращает число разосланных рецептов.
+    """
+    authors = Recipe.objects.filter(
+        in_feeds=False,
+        author__subscribers_count__lte=FEED_FANOUT_LIMIT
+    ).order_by().values_list('author_id', flat=True).distinct()
+    return sum(fan_out_author(author_id) for author_id in list(authors))
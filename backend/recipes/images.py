@@ -0,0 +1,100 @@
+"""Подготовка уменьшенных копий изображений вне обработки запроса.
+
+При загрузке изображения через API поле с копиями очищается, а сами
+копии разных размеров в формате WebP (или JPEG, если Pillow собран без
+WebP) создает отдельный процесс - команда build_image_variants --watch.
+Имена файлов строятся по хешу содержимого, поэтому одинаковые
+изображения обрабатываются и хранятся один раз.
+"""
+import hashlib
+from io import BytesIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from .models import Recipe
+from foodgram.constants import IMAGE_VARIANT_QUALITY, IMAGE_VARIANTS
+
+IMAGE_FIELDS = (
+    (Recipe, 'image', 'image_variants'),
+    (get_user_model(), 'avatar', 'avatar_variants'),
+)
+
+if features.check('webp'):
+    IMAGE_FORMAT, IMAGE_EXTENSION = 'WEBP', 'webp'
+else:
+    IMAGE_FORMAT, IMAGE_EXTENSION = 'JPEG', 'jpg'
+
+
+def render_variant(image, size):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    if IMAGE_FORMAT == 'JPEG' and variant.mode not in ('RGB', 'L'):
+        variant = variant.convert('RGB')
+    buffer = BytesIO()
+    variant.save(buffer, IMAGE_FORMAT, quality=IMAGE_VARIANT_QUALITY)
+    return buffer.getvalue()
+
+
+def build_variants(model_label, pk, field_name, variants_field):
+    """Создание копий изображения и сохранение путей к ним в модели."""
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).only(field_name).first()
+    file = instance and getattr(instance, field_name)
+    if not file:
+        return
+    with file.open('rb') as source:
+        content = source.read()
+    digest = hashlib.sha256(content).hexdigest()
+    upload_to = model._meta.get_field(field_name).upload_to
+    image = ImageOps.exif_transpose(Image.open(BytesIO(content)))
+    variants = {}
+    for name, size in IMAGE_VARIANTS.items():
+        path = (
+            f'{upload_to}variants/{digest[:2]}/'
+            f'{digest}_{name}.{IMAGE_EXTENSION}'
+        )
+        if not default_storage.exists(path):
+            path = default_storage.save(
+                path, ContentFile(render_variant(image, size)))
+        variants[name] = path
+    model.objects.filter(pk=pk, **{field_name: file.name}).update(
+        **{variants_field: variants})
+
+
+def build_missing_variants(model, field_name, variants_field, rebuild=False,
+                           skip=()):
+    """Создание копий изображений, у которых их нет.
+
+    Одно изображение может быть у многих записей, например у рецептов из
+    seed_load, поэтому копии создаются один раз для каждого имени файла.
+    При rebuild=True обрабатываются все изображения, файлы из skip
+    пропускаются. Возвращает число обработанных записей и словарь
+    ошибок по именам файлов.
+    """
+    objects = model.objects.exclude(**{field_name: ''}).exclude(
+        **{f'{field_name}__isnull': True})
+    if not rebuild:
+        objects = objects.filter(**{variants_field: {}})
+    built = 0
+    errors = {}
+    for name in list(objects.order_by(field_name).values_list(
+        field_name, flat=True
+    ).distinct()):
+        if name in skip:
+            continue
+        pk = objects.filter(**{field_name: name}).values_list(
+            'pk', flat=True).first()
+        try:
+            build_variants(model._meta.label, pk, field_name, variants_field)
+        except Exception as error:
+            errors[name] = error
+            continue
+        built += model.objects.filter(**{field_name: name}).update(**{
+            variants_field: model.objects.filter(pk=pk).values_list(
+                variants_field, flat=True).get()
+        })
+    return built, errors
@@ -0,0 +1,372 @@
+"""Индекс ингредиентов и тэгов рецептов в памяти процесса."""
+import bisect
+import heapq
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .catalog import Catalog
+from .models import Recipe, RecipeIndexChange, RecipeIngredient
+from foodgram.constants import (
+    RECIPE_INDEX_CHANGES_RETENTION, RECIPE_INDEX_GAP_WINDOW,
+    RECIPE_INDEX_PRUNE_EVERY, RECIPE_INDEX_SYNC_LIMIT, RECIPE_INDEX_TTL,
+    SIMILAR_INGREDIENT_WEIGHT, SIMILAR_TAG_WEIGHT
+)
+
+
+def jaccard(first, second, common):
+    union = len(first) + len(second) - common
+    return common / union if union else 0
+
+
+def to_bitset(positions, size):
+    """Целое число с установленными битами на позициях positions."""
+    bits = bytearray((size >> 3) + 1)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def bit_positions(bitset):
+    """Номера установленных битов."""
+    bits = bin(bitset)[:1:-1]
+    position = bits.find('1')
+    while position != -1:
+        yield position
+        position = bits.find('1', position + 1)
+
+
+class IndexData:
+    """Данные одной сборки индекса.
+
+    postings - отсортированные массивы id рецептов по ингредиентам,
+    ingredients и tags - кортежи id ингредиентов и тэгов по рецептам.
+    Каждому рецепту назначена позиция в битовых множествах: bitsets
+    хранит их для частых ингредиентов, где множество компактнее массива,
+    sizes - для рецептов с одинаковым числом ингредиентов. last_change -
+    id последнего примененного RecipeIndexChange, gaps - пропущенные id
+    перед ним, которые еще могут появиться после фиксации транзакций.
+    """
+
+    def __init__(self, ingredients, tags):
+        self.ingredients = ingredients
+        self.tags = tags
+        self.last_change = 0
+        self.gaps = set()
+        self.recipe_ids = sorted(ingredients)
+        self.positions = {
+            recipe_id: position
+            for position, recipe_id in enumerate(self.recipe_ids)
+        }
+        postings = defaultdict(lambda: array('q'))
+        recipes_by_size = defaultdict(list)
+        for position, recipe_id in enumerate(self.recipe_ids):
+            for ingredient_id in ingredients[recipe_id]:
+                postings[ingredient_id].append(recipe_id)
+            recipes_by_size[len(ingredients[recipe_id])].append(position)
+        self.postings = dict(postings)
+        count = len(self.recipe_ids)
+        self.sizes = {
+            size: to_bitset(positions, count)
+            for size, positions in recipes_by_size.items()
+        }
+        self.bitsets = {
+            ingredient_id: self.bitset(posting)
+            for ingredient_id, posting in self.postings.items()
+            if len(posting) * 64 > count
+        }
+
+    def bitset(self, posting):
+        return to_bitset(
+            (self.positions[recipe_id] for recipe_id in posting),
+            len(self.recipe_ids)
+        )
+
+    def ingredient_bitset(self, ingredient_id):
+        bitset = self.bitsets.get(ingredient_id)
+        if bitset is None:
+            bitset = self.bitset(self.postings.get(ingredient_id, ()))
+        return bitset
+
+    def replace(self, recipe_id, ingredients, tags):
+        current = self.ingredients.get(recipe_id, ())
+        position = self.positions.get(recipe_id)
+        if position is None:
+            position = self.positions[recipe_id] = len(self.recipe_ids)
+            self.recipe_ids.append(recipe_id)
+        bit = 1 << position
+        for ingredient_id in set(current) - set(ingredients):
+            posting = self.postings[ingredient_id]
+            index = bisect.bisect_left(posting, recipe_id)
+            if index < len(posting) and posting[index] == recipe_id:
+                del posting[index]
+            if ingredient_id in self.bitsets:
+                self.bitsets[ingredient_id] &= ~bit
+        for ingredient_id in set(ingredients) - set(current):
+            bisect.insort(
+                self.postings.setdefault(ingredient_id, array('q')),
+                recipe_id
+            )
+            if ingredient_id in self.bitsets:
+                self.bitsets[ingredient_id] |= bit
+        if current:
+            self.sizes[len(current)] &= ~bit
+        if ingredients:
+            self.sizes[len(ingredients)] = (
+                self.sizes.get(len(ingredients), 0) | bit)
+        for index, value in (
+            (self.ingredients, ingredients), (self.tags, tags)
+        ):
+            if value:
+                index[recipe_id] = value
+            else:
+                index.pop(recipe_id, None)
+
+    def pantry(self, ingredient_ids, max_missing):
+        """Рецепты, в которых не хватает не больше max_missing ингредиентов.
+
+        Битовые множества ингредиентов складываются поразрядно, и
+        planes[i] содержит i-й бит числа имеющихся ингредиентов каждого
+        рецепта. Рецепты упорядочены по доле имеющихся ингредиентов,
+        затем по числу недостающих и от новых к старым. Возвращает тройки
+        (id, доля имеющихся ингредиентов, число недостающих).
+        """
+        planes = []
+        for ingredient_id in set(ingredient_ids):
+            carry = self.ingredient_bitset(ingredient_id)
+            for digit, plane in enumerate(planes):
+                planes[digit], carry = plane ^ carry, plane & carry
+            if carry:
+                planes.append(carry)
+        groups = {}
+        for size, size_recipes in self.sizes.items():
+            for missing in range(min(max_missing, size - 1) + 1):
+                found = size - missing
+                if found >> len(planes):
+                    continue
+                recipes = size_recipes
+                for digit, plane in enumerate(planes):
+                    recipes &= plane if found >> digit & 1 else ~plane
+                if recipes:
+                    key = (found / size, -missing)
+                    groups[key] = groups.get(key, 0) | recipes
+        results = []
+        for (coverage, missing), recipes in sorted(
+            groups.items(), reverse=True
+        ):
+            recipe_ids = sorted(
+                (self.recipe_ids[position]
+                 for position in bit_positions(recipes)),
+                reverse=True
+            )
+            results.extend(
+                (recipe_id, coverage, -missing) for recipe_id in recipe_ids)
+        return results
+
+    def missing(self, recipe_id, ingredient_ids):
+        """Ингредиенты рецепта, которых нет в ingredient_ids."""
+        ingredient_ids = set(ingredient_ids)
+        return [
+            ingredient_id
+            for ingredient_id in self.ingredients.get(recipe_id, ())
+            if ingredient_id not in ingredient_ids
+        ]
+
+
+class RecipeIngredientIndex(Catalog):
+    """Обратный индекс ингредиент -> рецепты.
+
+    Строится из RecipeIngredient. Сохранение и удаление рецептов
+    записывается в RecipeIndexChange, и перед каждым обращением индекс
+    перечитывает рецепты из новых записей. Так изменения из других
+    процессов видны сразу, а не через ttl.
+
+    Индекс старше ttl перестраивается в фоновом потоке, а запросы тем
+    временем используют прежний индекс. В запросе индекс строится только
+    при первом обращении, после больше чем RECIPE_INDEX_SYNC_LIMIT
+    изменений и если он старше 2 * ttl: записи старше
+    RECIPE_INDEX_CHANGES_RETENTION удаляются, и синхронизировать его уже
+    нельзя.
+    """
+
+    def __init__(self, ttl=RECIPE_INDEX_TTL):
+        super().__init__(ttl)
+        self.lock = threading.Lock()
+        self.rebuilding = False
+
+    def build(self):
+        change_ids = list(RecipeIndexChange.objects.order_by(
+            '-id').values_list('id', flat=True)[:RECIPE_INDEX_GAP_WINDOW])
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.order_by(
+            'recipe_id', 'ingredient_id'
+        ).values_list('recipe_id', 'ingredient_id').iterator():
+            ingredients[recipe_id].append(ingredient_id)
+        tags = defaultdict(list)
+        for recipe_id, tag_id in Recipe.tags.through.objects.order_by(
+            'recipe_id', 'tag_id'
+        ).values_list('recipe_id', 'tag_id').iterator():
+            tags[recipe_id].append(tag_id)
+        index = IndexData(
+            {recipe_id: tuple(ids) for recipe_id, ids in ingredients.items()},
+            {recipe_id: tuple(ids) for recipe_id, ids in tags.items()},
+        )
+        if change_ids:
+            self.advance(index, sorted(change_ids))
+        return index
+
+    def get_index(self):
+        current = self._index
+        if current is None or time.monotonic() - current[1] > 2 * self.ttl:
+            current = self._index = (self.build(), time.monotonic())
+        elif time.monotonic() - current[1] > self.ttl:
+            self.rebuild_in_background()
+        index = current[0]
+        with self.lock:
+            if self.sync(index):
+                return index
+        self.invalidate()
+        return self.get_index()
+
+    def rebuild_in_background(self):
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+        threading.Thread(
+            target=self.rebuild, name='recipe-index', daemon=True).start()
+
+    def rebuild(self):
+        """Построение нового индекса в фоновом потоке.
+
+        Новый индекс синхронизируется с записями, созданными во время
+        построения, при следующем обращении.
+        """
+        try:
+            self._index = (self.build(), time.monotonic())
+        finally:
+            self.rebuilding = False
+            connection.close()
+
+    @staticmethod
+    def advance(index, change_ids):
+        """Сдвиг last_change к последней из полученных записей.
+
+        Пропущенные id после прежнего last_change добавляются в gaps,
+        из gaps удаляются полученные и вышедшие за
+        RECIPE_INDEX_GAP_WINDOW id.
+        """
+        last_change = max(index.last_change, change_ids[-1])
+        start = last_change - RECIPE_INDEX_GAP_WINDOW
+        index.gaps.update(range(
+            max(index.last_change, start, 0) + 1, last_change))
+        index.gaps.difference_update(change_ids)
+        index.gaps = {
+            change_id for change_id in index.gaps if change_id > start}
+        index.last_change = last_change
+
+    def sync(self, index):
+        """Применение к индексу новых записей RecipeIndexChange.
+
+        Записи с id из gaps могли быть созданы транзакциями, которые
+        зафиксированы позже следующих записей, поэтому они
+        запрашиваются повторно. Возвращает False, если изменений больше
+        RECIPE_INDEX_SYNC_LIMIT и индекс дешевле построить заново.
+        """
+        condition = Q(id__gt=index.last_change)
+        if index.gaps:
+            condition |= Q(id__in=index.gaps)
+        changes = list(RecipeIndexChange.objects.filter(condition).order_by(
+            'id').values_list('id', 'recipe_id')[:RECIPE_INDEX_SYNC_LIMIT + 1])
+        if len(changes) > RECIPE_INDEX_SYNC_LIMIT:
+            return False
+        if not changes:
+            return True
+        recipe_ids = {recipe_id for _, recipe_id in changes}
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('recipe_id', 'ingredient_id').values_list(
+            'recipe_id', 'ingredient_id'
+        ):
+            ingredients[recipe_id].append(ingredient_id)
+        tags = defaultdict(list)
+        for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('recipe_id', 'tag_id').values_list('recipe_id', 'tag_id'):
+            tags[recipe_id].append(tag_id)
+        for recipe_id in recipe_ids:
+            index.replace(
+                recipe_id,
+                tuple(ingredients[recipe_id]),
+                tuple(tags[recipe_id])
+            )
+        self.advance(index, [change_id for change_id, _ in changes])
+        return True
+
+    def similar(self, recipe_id, limit):
+        """Рецепты с наибольшим совпадением ингредиентов и тэгов.
+
+        Кандидаты - рецепты, у которых есть хотя бы один общий
+        ингредиент. Их сходство - взвешенная сумма коэффициентов Жаккара
+        по ингредиентам и по тэгам. Возвращает пары (id, сходство).
+        """
+        index = self.get_index()
+        own = index.ingredients.get(recipe_id, ())
+        own_tags = set(index.tags.get(recipe_id, ()))
+        shared = Counter()
+        for ingredient_id in own:
+            shared.update(index.postings.get(ingredient_id, ()))
+        shared.pop(recipe_id, None)
+        scores = []
+        for candidate, common in shared.items():
+            candidate_tags = index.tags.get(candidate, ())
+            score = (
+                SIMILAR_INGREDIENT_WEIGHT * jaccard(
+                    own, index.ingredients.get(candidate, ()), common)
+                + SIMILAR_TAG_WEIGHT * jaccard(
+                    own_tags, candidate_tags,
+                    len(own_tags.intersection(candidate_tags)))
+            )
+            scores.append((score, candidate))
+        return [
+            (candidate, score)
+            for score, candidate in heapq.nlargest(limit, scores)
+        ]
+
+    def pantry(self, ingredient_ids, max_missing):
+        """Рецепты, в которых не хватает не больше max_missing ингредиентов.
+
+        См. IndexData.pantry.
+        """
+        return self.get_index().pantry(ingredient_ids, max_missing)
+
+    def missing(self, recipe_id, ingredient_ids):
+        return self.get_index().missing(recipe_id, ingredient_ids)
+
+
+recipe_index = RecipeIngredientIndex()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def record_recipe_change(sender, instance, **kwargs):
+    """Запись изменения рецепта для индексов всех процессов.
+
+    Каждая RECIPE_INDEX_PRUNE_EVERY-я запись удаляет записи старше
+    RECIPE_INDEX_CHANGES_RETENTION, чтобы таблица не росла.
+    """
+    change = RecipeIndexChange.objects.create(recipe_id=instance.id)
+    if change.id % RECIPE_INDEX_PRUNE_EVERY == 0:
+        RecipeIndexChange.objects.filter(
+            created__lt=timezone.now()
+            - timedelta(seconds=RECIPE_INDEX_CHANGES_RETENTION)
+        ).delete()
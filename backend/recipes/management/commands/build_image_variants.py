@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ...images import IMAGE_FIELDS, build_missing_variants
+from foodgram.constants import IMAGE_VARIANTS_POLL_INTERVAL
+
+
+class Command(BaseCommand):
+    help = (
+        'Создание уменьшенных копий изображений рецептов и аватаров, у '
+        'которых их нет. С флагом --watch команда работает постоянно и '
+        'обрабатывает изображения, загруженные через API.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать копии и для изображений, у которых они есть.'
+        )
+        parser.add_argument(
+            '--watch', action='store_true',
+            help='Проверять новые изображения, пока процесс не остановят.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=IMAGE_VARIANTS_POLL_INTERVAL,
+            help='Пауза между проверками в режиме --watch, с.'
+        )
+
+    def handle(self, *args, **options):
+        # Файлы с ошибками не обрабатываются повторно до перезапуска,
+        # чтобы --watch не читал их при каждой проверке.
+        failed = set()
+        rebuild = options['all']
+        while True:
+            for model, field_name, variants_field in IMAGE_FIELDS:
+                built, errors = build_missing_variants(
+                    model, field_name, variants_field, rebuild, failed)
+                failed.update(errors)
+                for name, error in errors.items():
+                    self.stderr.write(f'{name}: {error}')
+                if built or errors or not options['watch']:
+                    self.stdout.write(
+                        f'{model._meta.verbose_name_plural}: обработано '
+                        f'записей {built}, ошибок {len(errors)}'
+                    )
+            if not options['watch']:
+                return
+            rebuild = False
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -1,26 +1,138 @@
-from django.core.management.base import BaseCommand
+import csv
+import json
+import re
+import time
+from argparse import ArgumentTypeError
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from ...bulk import bulk_insert
 from ...models import Ingredient
 
-import csv
+
+BATCH_SIZE = 1000
+JSON_CHUNK_SIZE = 64 * 1024
+FORMATS = ('csv', 'json')
+WHITESPACE = re.compile(r'\s*')
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise ArgumentTypeError('значение должно быть не меньше 1.')
+    return number
 
 
 class Command(BaseCommand):
-    help = 'Импорт данных из csv файлов в БД.'
+    help = 'Импорт ингредиентов из csv или json файла в БД.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='data/ingredients.csv',
+            help='Путь к файлу с ингредиентами.'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла. По умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size', type=positive_int, default=BATCH_SIZE,
+            help='Количество записей в одном запросе к БД.'
+        )
 
     def handle(self, *args, **options):
-        self.import_ingredients()
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(
+                f'Неизвестный формат файла: {path}. '
+                f'Укажите --format {"|".join(FORMATS)}.'
+            )
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден.')
+        start = time.monotonic()
+        rows, created = self.import_ingredients(
+            path, file_format, options['batch_size'])
+        duration = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {rows}, добавлено ингредиентов: {created} '
+            f'за {duration:.2f} с ({rows / max(duration, 1e-6):.0f} строк/с).'
+        ))
+
+    def read_csv(self, file):
+        for row in csv.reader(file):
+            if row:
+                yield row[0], row[1]
+
+    def read_json(self, file):
+        """Чтение JSON-массива ингредиентов частями по JSON_CHUNK_SIZE.
+
+        Элементы массива разбираются по одному, поэтому файл не
+        загружается в память целиком.
+        """
+        decoder = json.JSONDecoder()
+        buffer = ''
+        position = 0
+        started = False
+        empty = True
+        after_item = False
+
+        def read_more():
+            nonlocal buffer, position
+            chunk = file.read(JSON_CHUNK_SIZE)
+            buffer = buffer[position:] + chunk
+            position = 0
+            return bool(chunk)
 
-    def import_ingredients(self):
-        file_path = 'data/ingredients.csv'
+        while True:
+            position = WHITESPACE.match(buffer, position).end()
+            if position == len(buffer):
+                if not read_more():
+                    raise CommandError('Неожиданный конец JSON-файла.')
+                continue
+            char = buffer[position]
+            if not started:
+                if char != '[':
+                    raise CommandError('Ожидается JSON-массив ингредиентов.')
+                started = True
+                position += 1
+                continue
+            if char == ']' and (after_item or empty):
+                return
+            if after_item:
+                if char != ',':
+                    raise CommandError(
+                        f'Неверный JSON: ожидается "," или "]", '
+                        f'получено {char!r}.'
+                    )
+                after_item = False
+                position += 1
+                continue
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as error:
+                if not read_more():
+                    raise CommandError(f'Неверный JSON: {error}')
+                continue
+            empty = False
+            after_item = True
+            yield item['name'], item['measurement_unit']
 
-        with open(file_path, 'r', encoding='utf-8') as csv_file:
-            reader = csv.reader(csv_file)
-            next(reader)
+    def import_ingredients(self, path, file_format, batch_size):
+        """Загрузка ингредиентов пачками в одной транзакции.
 
-            for row in reader:
-                ingredient = Ingredient.objects.create(
-                    name=row[0],
-                    measurement_unit=row[1]
-                )
-                ingredient.save()
+        Уже существующие ингредиенты пропускаются, поэтому команду можно
+        запускать повторно.
+        """
+        reader = self.read_csv if file_format == 'csv' else self.read_json
+        with open(path, 'r', encoding='utf-8') as file, transaction.atomic():
+            count_before = Ingredient.objects.count()
+            ingredients = (
+                Ingredient(name=name.strip(), measurement_unit=unit.strip())
+                for name, unit in reader(file)
+            )
+            rows = bulk_insert(Ingredient, ingredients, batch_size)
+            created = Ingredient.objects.count() - count_before
+        return rows, created
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ...feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассылка в ленты подписчиков рецептов, созданных в обход API, '
+        'и рецептов авторов, число подписчиков которых опустилось до '
+        'FEED_FANOUT_LIMIT.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'Разослано рецептов: {rebuild_feeds()}')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...shopping_list import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверка списков покупок по ингредиентам с рецептами в списках '
+        'покупок и исправление расхождений.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только проверить и завершиться с ошибкой при расхождениях.'
+        )
+
+    def handle(self, *args, **options):
+        result = rebuild_shopping_lists(fix=not options['check'])
+        self.stdout.write(
+            f'Отсутствующих записей: {result["missing"]}, '
+            f'неверных: {result["changed"]}, лишних: {result["stale"]}'
+        )
+        if options['check'] and any(result.values()):
+            raise CommandError('Списки покупок расходятся с рецептами.')
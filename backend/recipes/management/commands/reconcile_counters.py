@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ...counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков избранного, покупок, рецептов и подписчиков.'
+
+    def handle(self, *args, **options):
+        for counter, fixed in reconcile_counters().items():
+            self.stdout.write(f'{counter}: исправлено записей - {fixed}')
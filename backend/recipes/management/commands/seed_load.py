@@ -0,0 +1,300 @@
+import io
+import random
+import string
+import time
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+
+from ...bulk import bulk_insert
+from ...counters import reconcile_counters
+from ...feed import rebuild_feeds
+from ...shopping_list import rebuild_shopping_lists
+from ...models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Subscribe,
+    Tag
+)
+from foodgram.constants import (
+    LINK_LENGTH, MAX_AMOUNT, MAX_COOKING_TIME, MIN_AMOUNT, MIN_COOKING_TIME
+)
+from link_shortner.models import Link
+
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+SEED_IMAGE = 'recipes/images/seed.png'
+TAGS = (
+    ('Завтрак', 'breakfast'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'dinner'),
+    ('Десерт', 'dessert'),
+    ('Выпечка', 'bakery'),
+    ('Вегетарианское', 'vegetarian'),
+    ('Быстро', 'quick'),
+    ('Праздничное', 'holiday'),
+)
+DISHES = (
+    'Салат', 'Суп', 'Пирог', 'Рагу', 'Запеканка', 'Омлет', 'Каша',
+    'Паста', 'Соус', 'Десерт', 'Котлеты', 'Блины', 'Смузи', 'Плов',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерация пользователей, рецептов, избранного, списков покупок, '
+        'подписок и коротких ссылок для нагрузочного тестирования.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Количество пользователей.'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=10000,
+            help='Количество рецептов.'
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Среднее число рецептов в избранном у пользователя.'
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Среднее число рецептов в списке покупок у пользователя.'
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Среднее число подписок у пользователя.'
+        )
+        parser.add_argument(
+            '--links', type=int, default=1000,
+            help='Количество коротких ссылок на рецепты.'
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help=(
+                'Параметр распределения Парето для популярности авторов, '
+                'рецептов и ингредиентов. Чем меньше, тем сильнее перекос.'
+            )
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел.'
+        )
+        parser.add_argument(
+            '--prefix', default='load',
+            help='Префикс имен создаваемых пользователей.'
+        )
+        parser.add_argument(
+            '--password', default='load-password',
+            help='Пароль всех создаваемых пользователей.'
+        )
+        parser.add_argument(
+            '--skip-feeds', action='store_true',
+            help=(
+                'Не рассылать рецепты в ленты подписчиков. Ленты можно '
+                'заполнить позже командой rebuild_feeds.'
+            )
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Количество записей в одном запросе к БД.'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.alpha = options['alpha']
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix} уже созданы. '
+                f'Укажите другой --prefix.'
+            )
+        ingredients = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True))
+        if not ingredients:
+            raise CommandError(
+                'В базе нет ингредиентов, загрузите их командой import_data.')
+        start = time.monotonic()
+        with transaction.atomic():
+            tags = self.create_tags()
+            users = self.create_users(
+                prefix, options['users'], options['password'])
+            recipes = self.create_recipes(
+                users, tags, ingredients, options['recipes'])
+            self.create_user_recipes(
+                Favorite, users, recipes, options['favorites'])
+            self.create_user_recipes(
+                ShoppingCart, users, recipes, options['carts'])
+            self.create_subscriptions(users, options['subscriptions'])
+            self.create_links(recipes, options['links'])
+            reconcile_counters()
+            self.fill_shopping_lists()
+            if not options['skip_feeds']:
+                self.fill_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные сгенерированы за {time.monotonic() - start:.1f} с.'))
+
+    def report(self, name, count, start):
+        self.stdout.write(
+            f'{name}: {count} за {time.monotonic() - start:.1f} с')
+
+    def insert(self, model, objects):
+        """Вставка объектов из генератора пачками batch_size."""
+        return bulk_insert(model, objects, self.batch_size)
+
+    def weights(self, count):
+        """Накопленные веса с распределением Парето.
+
+        Небольшая часть объектов получает большую часть выборок:
+        так распределены популярные авторы, рецепты и ингредиенты.
+        """
+        return list(accumulate(
+            self.rng.paretovariate(self.alpha) for _ in range(count)))
+
+    def sample(self, population, cum_weights, count):
+        """До count различных элементов с учетом весов."""
+        return set(self.rng.choices(
+            population, cum_weights=cum_weights, k=count))
+
+    def amount(self, average):
+        """Число связей у объекта со средним значением average."""
+        return int(self.rng.expovariate(1 / average)) if average else 0
+
+    def create_tags(self):
+        Tag.objects.bulk_create(
+            [Tag(name=name, slug=slug) for name, slug in TAGS],
+            ignore_conflicts=True
+        )
+        return list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+    def create_users(self, prefix, count, password):
+        """Пользователи с одним заранее вычисленным хэшем пароля."""
+        start = time.monotonic()
+        last_id = User.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        password = make_password(password)
+        self.insert(User, (
+            User(
+                username=f'{prefix}-{number}',
+                email=f'{prefix}-{number}@example.com',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password,
+            )
+            for number in range(count)
+        ))
+        users = list(User.objects.filter(id__gt=last_id).order_by(
+            'id').values_list('id', flat=True))
+        self.author_weights = self.weights(len(users))
+        self.report('Пользователи', len(users), start)
+        return users
+
+    def seed_image(self):
+        """Одно изображение, общее для всех сгенерированных рецептов."""
+        if not default_storage.exists(SEED_IMAGE):
+            buffer = io.BytesIO()
+            Image.new('RGB', (480, 480), 'orange').save(buffer, 'PNG')
+            default_storage.save(SEED_IMAGE, ContentFile(buffer.getvalue()))
+        return SEED_IMAGE
+
+    def create_recipes(self, users, tags, ingredients, count):
+        """Рецепты популярных авторов, тэги и ингредиенты к ним."""
+        start = time.monotonic()
+        last_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        authors = self.rng.choices(
+            users, cum_weights=self.author_weights, k=count)
+        image = self.seed_image()
+        self.insert(Recipe, (
+            Recipe(
+                author_id=author,
+                name=f'{self.rng.choice(DISHES)} №{number}',
+                text=f'Описание рецепта №{number}.',
+                image=image,
+                cooking_time=self.rng.randint(
+                    MIN_COOKING_TIME, min(MAX_COOKING_TIME, 180)),
+            )
+            for number, author in enumerate(authors)
+        ))
+        recipes = list(Recipe.objects.filter(id__gt=last_id).order_by(
+            'id').values_list('id', flat=True))
+        self.recipe_weights = self.weights(len(recipes))
+        self.report('Рецепты', len(recipes), start)
+
+        start = time.monotonic()
+        ingredient_weights = self.weights(len(ingredients))
+        count = self.insert(RecipeIngredient, (
+            RecipeIngredient(
+                recipe_id=recipe,
+                ingredient_id=ingredient,
+                amount=self.rng.randint(MIN_AMOUNT, min(MAX_AMOUNT, 1000)),
+            )
+            for recipe in recipes
+            for ingredient in self.sample(
+                ingredients, ingredient_weights, self.rng.randint(3, 12))
+        ))
+        self.report('Ингредиенты рецептов', count, start)
+
+        start = time.monotonic()
+        tag_weights = self.weights(len(tags))
+        count = self.insert(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+            for recipe in recipes
+            for tag in self.sample(tags, tag_weights, self.rng.randint(1, 3))
+        ))
+        self.report('Тэги рецептов', count, start)
+        return recipes
+
+    def create_user_recipes(self, model, users, recipes, average):
+        """Избранное или списки покупок с перекосом к популярным рецептам."""
+        start = time.monotonic()
+        count = self.insert(model, (
+            model(user_id=user, recipe_id=recipe)
+            for user in users
+            for recipe in self.sample(
+                recipes, self.recipe_weights, self.amount(average))
+        ))
+        self.report(model._meta.verbose_name_plural, count, start)
+
+    def create_subscriptions(self, users, average):
+        """Подписки, большая часть которых приходится на звездных авторов."""
+        start = time.monotonic()
+        count = self.insert(Subscribe, (
+            Subscribe(user_id=user, author_id=author)
+            for user in users
+            for author in self.sample(
+                users, self.author_weights, self.amount(average))
+            if author != user
+        ))
+        self.report('Подписки', count, start)
+
+    def fill_shopping_lists(self):
+        start = time.monotonic()
+        count = rebuild_shopping_lists()['missing']
+        self.report('Ингредиенты в списках покупок', count, start)
+
+    def fill_feeds(self):
+        start = time.monotonic()
+        count = rebuild_feeds()
+        self.report('Рецепты в лентах подписчиков', count, start)
+
+    def create_links(self, recipes, count):
+        start = time.monotonic()
+        alphabet = string.ascii_letters + string.digits
+        count = self.insert(Link, (
+            Link(
+                full_url=f'/recipes/{recipe}/',
+                short_url=''.join(self.rng.choices(alphabet, k=LINK_LENGTH)),
+            )
+            for recipe in self.rng.sample(recipes, min(count, len(recipes)))
+        ))
+        self.report('Короткие ссылки', count, start)
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-17 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(max_length=32, unique=True, verbose_name='Слаг'),
+        ),
+    ]
@@ -1,7 +1,11 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models import F, Q
+from django.db.models import (
+    BooleanField, Exists, F, OuterRef, Prefetch, Q, Value, Window
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
 from foodgram.constants import (
     MAX_AMOUNT, MAX_COOKING_TIME, MAX_LENGTH, MEASUREMENT_UNIT_LENGTH,
@@ -47,6 +51,7 @@ class Tag(models.Model):
     )
     slug = models.SlugField(
         max_length=TAG_LENGTH,
+        unique=True,
         verbose_name='Слаг',
     )
 
@@ -59,6 +64,62 @@ class Tag(models.Model):
         return self.name[:STRING_MAX_LENGTH]
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов для рецептов."""
+
+    def with_user_flags(self, user):
+        """Отметки об избранном и списке покупок для пользователя."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField())
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            )
+        )
+
+    def with_related(self, relations=('author', 'tags', 'ingredients')):
+        """Автор, тэги и ингредиенты рецепта одним набором запросов."""
+        queryset = self
+        if 'author' in relations:
+            queryset = queryset.select_related('author')
+        if 'tags' in relations:
+            queryset = queryset.prefetch_related('tags')
+        if 'ingredients' in relations:
+            queryset = queryset.prefetch_related(Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ))
+        return queryset
+
+    def latest_per_author(self, authors, limit):
+        """Не более limit последних рецептов каждого из авторов.
+
+        Рецепты нумеруются внутри автора оконной функцией ROW_NUMBER,
+        поэтому выборка для всех авторов выполняется одним запросом.
+        ValueError, если limit меньше 1.
+        """
+        if limit < 1:
+            raise ValueError(f'Неверное количество рецептов: {limit}')
+        ranked = Recipe.objects.filter(author__in=authors).annotate(
+            recipe_rank=Window(
+                expression=RowNumber(),
+                partition_by=F('author'),
+                order_by=(F('pub_date').desc(), F('id').desc())
+            )
+        ).values('id', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(id__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE recipe_rank <= %s',
+            (*params, limit)
+        ))
+
+
 class Recipe(models.Model):
     """Модель рецепта."""
     author = models.ForeignKey(
@@ -75,6 +136,11 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         verbose_name='Изображение блюда'
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии изображения',
+        default=dict,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Описание рецепта'
     )
@@ -113,11 +179,40 @@ class Recipe(models.Model):
         verbose_name='Дата добавления рецепта',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Число добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='Число добавлений в список покупок',
+        default=0,
+        editable=False
+    )
+
+    in_feeds = models.BooleanField(
+        verbose_name='Разослан в ленты подписчиков',
+        default=False,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                condition=Q(in_feeds=False),
+                name='recipe_author_pull_feed_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name[:STRING_MAX_LENGTH]
@@ -248,3 +343,102 @@ class Subscribe(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписчика автора."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата добавления рецепта'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_user_feed_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество ингредиента'
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_shopping_list_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} в списке покупок у {self.user}'
+
+
+class RecipeIndexChange(models.Model):
+    """Изменение рецепта для индекса ингредиентов в других процессах."""
+    recipe_id = models.BigIntegerField(
+        verbose_name='Id рецепта'
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now_add=True,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Изменение индекса рецептов'
+        verbose_name_plural = 'Изменения индекса рецептов'
+
+    def __str__(self):
+        return f'Рецепт {self.recipe_id}'
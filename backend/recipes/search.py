@@ -0,0 +1,104 @@
+"""Полнотекстовый поиск по названию и описанию рецептов.
+
+На PostgreSQL поиск идет по генерируемому столбцу search_vector
+с GIN-индексом и русской морфологией, он создается миграцией.
+На SQLite используется внешняя FTS5-таблица, которая поддерживается
+триггерами и создается после применения миграций.
+"""
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Recipe
+
+
+RECIPE_TABLE = Recipe._meta.db_table
+FTS_TABLE = f'{RECIPE_TABLE}_fts'
+
+SQLITE_FTS_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"name, text, content='{RECIPE_TABLE}', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert "
+    f"AFTER INSERT ON {RECIPE_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, text) "
+    f"VALUES (new.id, new.name, new.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete "
+    f"AFTER DELETE ON {RECIPE_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) "
+    f"VALUES ('delete', old.id, old.name, old.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update "
+    f"AFTER UPDATE OF name, text ON {RECIPE_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) "
+    f"VALUES ('delete', old.id, old.name, old.text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, text) "
+    f"VALUES (new.id, new.name, new.text); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+)
+
+
+def create_sqlite_search_index(using='default', **kwargs):
+    """Создание FTS5-таблицы и триггеров для SQLite.
+
+    SQLite пересоздает таблицу рецептов при изменении ее схемы, и триггеры
+    при этом удаляются, поэтому проверка выполняется после каждого
+    применения миграций, а индекс при необходимости перестраивается.
+    Триггер изменения срабатывает только на name и text, чтобы изменение
+    счетчиков и других полей рецепта не переписывало индекс; триггер из
+    прежних версий без списка столбцов заменяется.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if RECIPE_TABLE not in connection.introspection.table_names(cursor):
+            return
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type = 'trigger' AND name LIKE %s",
+            (f'{FTS_TABLE}_%',)
+        )
+        triggers = dict(cursor.fetchall())
+        update_trigger = triggers.get(f'{FTS_TABLE}_update') or ''
+        if len(triggers) == 3 and 'UPDATE OF' in update_trigger:
+            return
+        cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update')
+        for sql in SQLITE_FTS_SQL:
+            cursor.execute(sql)
+
+
+def fts_query(query):
+    """Запрос FTS5: все слова должны встречаться, допускается окончание."""
+    words = query.replace('"', ' ').split()
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, в порядке релевантности."""
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        queryset = queryset.filter(id__in=RawSQL(
+            f'SELECT id FROM {RECIPE_TABLE} '
+            f"WHERE search_vector @@ websearch_to_tsquery('russian', %s)",
+            (query,)
+        )).annotate(search_rank=RawSQL(
+            f'ts_rank({RECIPE_TABLE}.search_vector, '
+            f"websearch_to_tsquery('russian', %s))",
+            (query,), output_field=FloatField()
+        ))
+    elif vendor == 'sqlite':
+        match = fts_query(query)
+        if not match:
+            return queryset.none()
+        queryset = queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (match,)
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -rank FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = {RECIPE_TABLE}.id',
+            (match,), output_field=FloatField()
+        ))
+    else:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query))
+    return queryset.order_by('-search_rank', *Recipe._meta.ordering)
@@ -0,0 +1,174 @@
+"""Списки покупок пользователей, собранные по ингредиентам.
+
+ShoppingListItem хранит суммарное количество каждого ингредиента в
+рецептах из списка покупок пользователя. Записи изменяются при
+добавлении и удалении рецептов из списка покупок, изменении
+ингредиентов рецепта и удалении рецепта через API. Изменения в обход
+API исправляет команда rebuild_shopping_lists. При каждом изменении
+списка увеличивается User.shopping_cart_version, по которой строится
+ETag выгрузки списка покупок.
+"""
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+
+from .bulk import bulk_insert
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+from foodgram.constants import SHOPPING_LIST_BATCH_SIZE
+
+User = get_user_model()
+
+
+def bump_versions(user_ids):
+    User.objects.filter(id__in=user_ids).update(
+        shopping_cart_version=F('shopping_cart_version') + 1)
+
+
+def insert_items(items):
+    """Вставка записей списков покупок из генератора пачками."""
+    bulk_insert(ShoppingListItem, items, SHOPPING_LIST_BATCH_SIZE)
+
+
+def recipe_amounts(recipe_id):
+    """Количества ингредиентов рецепта по id ингредиентов."""
+    return dict(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id).values_list('ingredient_id', 'amount'))
+
+
+def apply_deltas(user_ids, deltas):
+    """Изменение списков покупок пользователей на deltas.
+
+    user_ids - список или подзапрос с id пользователей, deltas - словарь
+    изменений количества по id ингредиентов. Записи с нулевым
+    количеством удаляются.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not deltas:
+        return
+    added = [
+        ingredient_id for ingredient_id, delta in deltas.items() if delta > 0
+    ]
+    if added:
+        insert_items(
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=0)
+            for user_id in user_ids
+            for ingredient_id in added
+        )
+    ingredients_by_delta = defaultdict(list)
+    for ingredient_id, delta in deltas.items():
+        ingredients_by_delta[delta].append(ingredient_id)
+    items = ShoppingListItem.objects.filter(user_id__in=user_ids)
+    for delta, ingredient_ids in ingredients_by_delta.items():
+        items.filter(ingredient_id__in=ingredient_ids).update(
+            amount=Greatest(F('amount') + delta, 0))
+    if len(added) < len(deltas):
+        items.filter(amount=0).delete()
+    bump_versions(user_ids)
+
+
+def add_recipe(user_id, recipe_id):
+    apply_deltas([user_id], recipe_amounts(recipe_id))
+
+
+def remove_recipe(user_id, recipe_id):
+    apply_deltas([user_id], {
+        ingredient_id: -amount
+        for ingredient_id, amount in recipe_amounts(recipe_id).items()
+    })
+
+
+def change_recipe(recipe_id, deltas):
+    """Изменение списков покупок, в которых есть рецепт."""
+    apply_deltas(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id).values_list('user_id', flat=True),
+        deltas
+    )
+
+
+def delete_recipe(recipe_id):
+    """Удаление рецепта из всех списков покупок.
+
+    Вызывается до удаления рецепта, пока существуют его ингредиенты и
+    записи списков покупок.
+    """
+    change_recipe(recipe_id, {
+        ingredient_id: -amount
+        for ingredient_id, amount in recipe_amounts(recipe_id).items()
+    })
+
+
+def user_items(user):
+    """Ингредиенты списка покупок пользователя по названию."""
+    return ShoppingListItem.objects.filter(user=user).order_by(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).values_list(
+        'ingredient_id',
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount'
+    )
+
+
+def rebuild_shopping_lists(fix=True):
+    """Сверка списков покупок с рецептами в ShoppingCart.
+
+    Возвращает число отсутствующих, неверных и лишних записей. При
+    fix=True расхождения исправляются.
+    """
+    with transaction.atomic():
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in RecipeIngredient.objects
+            .filter(recipe__shopping_cart__isnull=False)
+            .values('recipe__shopping_cart__user_id', 'ingredient_id')
+            .annotate(total=Sum('amount'))
+            .values_list(
+                'recipe__shopping_cart__user_id', 'ingredient_id', 'total')
+            .order_by()
+            .iterator()
+        }
+        changed = []
+        stale = []
+        for item in ShoppingListItem.objects.only(
+            'id', 'user_id', 'ingredient_id', 'amount'
+        ).iterator():
+            amount = actual.pop((item.user_id, item.ingredient_id), None)
+            if amount is None:
+                stale.append(item)
+            elif amount != item.amount:
+                item.amount = amount
+                changed.append(item)
+        if fix:
+            user_ids = sorted(
+                {item.user_id for item in stale + changed}
+                | {user_id for user_id, _ in actual}
+            )
+            for start in range(0, len(user_ids), SHOPPING_LIST_BATCH_SIZE):
+                bump_versions(
+                    user_ids[start:start + SHOPPING_LIST_BATCH_SIZE])
+            stale = [item.id for item in stale]
+            for start in range(0, len(stale), SHOPPING_LIST_BATCH_SIZE):
+                ShoppingListItem.objects.filter(id__in=stale[
+                    start:start + SHOPPING_LIST_BATCH_SIZE]).delete()
+            ShoppingListItem.objects.bulk_update(
+                changed, ['amount'], batch_size=SHOPPING_LIST_BATCH_SIZE)
+            insert_items(
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    amount=amount
+                )
+                for (user_id, ingredient_id), amount in actual.items()
+            )
+    return {
+        'missing': len(actual),
+        'changed': len(changed),
+        'stale': len(stale),
+    }
@@ -0,0 +1,270 @@
+import io
+import json
+import random
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .index import IndexData, RecipeIngredientIndex
+from .management.commands import import_data
+from .models import Ingredient, Recipe, RecipeIndexChange, RecipeIngredient
+from .units import normalize
+
+from foodgram.constants import (
+    RECIPE_INDEX_CHANGES_RETENTION, RECIPE_INDEX_SYNC_LIMIT
+)
+
+User = get_user_model()
+
+
+def naive_pantry(ingredients, available, max_missing):
+    """Подбор рецептов перебором множеств."""
+    available = set(available)
+    matches = []
+    for recipe_id, recipe_ingredients in ingredients.items():
+        found = len(available.intersection(recipe_ingredients))
+        missing = len(recipe_ingredients) - found
+        if found and missing <= max_missing:
+            matches.append(
+                (recipe_id, found / len(recipe_ingredients), missing))
+    return sorted(
+        matches, key=lambda match: (-match[1], match[2], -match[0]))
+
+
+class PantryTest(SimpleTestCase):
+    """IndexData.pantry совпадает с перебором множеств."""
+
+    def setUp(self):
+        self.rng = random.Random(42)
+        # Первые ингредиенты встречаются часто и хранятся битовыми
+        # множествами, остальные редки и берутся из массивов рецептов.
+        weights = [100] * 5 + [1] * 195
+        self.ingredients = {}
+        for recipe_id in range(1, 401):
+            count = self.rng.randint(1, 8)
+            self.ingredients[recipe_id] = tuple(sorted(set(
+                self.rng.choices(range(1, 201), weights, k=count))))
+        self.index = IndexData(dict(self.ingredients), {})
+
+    def queries(self):
+        yield (1, 2, 3), 0
+        yield (1, 2, 3, 4, 5), 2
+        yield (), 2
+        yield (999,), 1
+        for _ in range(50):
+            yield (
+                self.rng.sample(range(1, 201), self.rng.randint(1, 30)),
+                self.rng.randint(0, 3)
+            )
+
+    def assert_matches(self):
+        self.assertTrue(any(
+            len(posting) * 64 <= len(self.index.recipe_ids)
+            for posting in self.index.postings.values()
+        ))
+        for available, max_missing in self.queries():
+            with self.subTest(available=available, max_missing=max_missing):
+                self.assertEqual(
+                    self.index.pantry(available, max_missing),
+                    naive_pantry(self.ingredients, available, max_missing)
+                )
+
+    def replace(self, recipe_id, ingredients):
+        self.index.replace(recipe_id, ingredients, ())
+        if ingredients:
+            self.ingredients[recipe_id] = ingredients
+        else:
+            self.ingredients.pop(recipe_id)
+
+    def test_built_index(self):
+        self.assert_matches()
+
+    def test_added_recipe(self):
+        self.replace(401, (1, 2, 150))
+        self.replace(402, (250,))
+        self.assert_matches()
+        self.assertEqual(self.index.pantry((250,), 0), [(402, 1.0, 0)])
+
+    def test_removed_recipe(self):
+        self.replace(7, ())
+        self.replace(8, ())
+        self.assert_matches()
+
+    def test_changed_ingredient_count(self):
+        self.replace(10, self.ingredients[10] + (199, 200))
+        self.replace(11, self.ingredients[11][:1])
+        self.replace(12, (3, 4, 5, 6, 7, 8, 9, 10, 11))
+        self.assert_matches()
+
+    def test_missing(self):
+        self.assertEqual(
+            self.index.missing(12, self.ingredients[12][1:]),
+            list(self.ingredients[12][:1])
+        )
+
+
+class RecipeIndexSyncTest(TestCase):
+    """Индекс подхватывает изменения рецептов из RecipeIndexChange."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов'
+        )
+        cls.flour = Ingredient.objects.create(
+            name='мука', measurement_unit='г')
+        cls.milk = Ingredient.objects.create(
+            name='молоко', measurement_unit='мл')
+
+    def create_recipe(self, *ingredients):
+        recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/recipe.png'
+        )
+        for ingredient in ingredients:
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100)
+        return recipe
+
+    def test_changes_from_other_process(self):
+        index = RecipeIngredientIndex()
+        first = self.create_recipe(self.flour)
+        self.assertEqual(index.pantry([self.flour.id], 0), [(first.id, 1, 0)])
+        # Изменения записываются сигналами, а не через этот экземпляр
+        # индекса, как в другом процессе.
+        second = self.create_recipe(self.flour, self.milk)
+        self.assertEqual(
+            index.pantry([self.flour.id, self.milk.id], 0),
+            [(second.id, 1, 0), (first.id, 1, 0)]
+        )
+        first.delete()
+        self.assertEqual(index.pantry([self.flour.id], 1), [
+            (second.id, 0.5, 1)])
+        self.assertNumQueries(1, index.get_index)
+
+    def test_gaps(self):
+        index = RecipeIngredientIndex()
+        first = self.create_recipe(self.flour)
+        last_change = index.get_index().last_change
+        second = self.create_recipe(self.milk)
+        # Запись с меньшим id зафиксирована позже записи с большим.
+        RecipeIndexChange.objects.filter(recipe_id=second.id).update(
+            id=last_change + 5)
+        RecipeIngredient.objects.filter(recipe=first).update(
+            ingredient=self.milk)
+        self.assertEqual(index.get_index().gaps, set(range(
+            last_change + 1, last_change + 5)))
+        RecipeIndexChange.objects.create(
+            id=last_change + 2, recipe_id=first.id)
+        self.assertEqual(index.pantry([self.milk.id], 0), [
+            (second.id, 1, 0), (first.id, 1, 0)])
+        self.assertEqual(index.get_index().gaps, {
+            last_change + 1, last_change + 3, last_change + 4})
+
+    def test_rebuild_after_many_changes(self):
+        index = RecipeIngredientIndex()
+        self.create_recipe(self.flour)
+        built = index.get_index()
+        RecipeIndexChange.objects.bulk_create(
+            RecipeIndexChange(recipe_id=0)
+            for _ in range(RECIPE_INDEX_SYNC_LIMIT + 1)
+        )
+        self.assertIsNot(index.get_index(), built)
+
+    @mock.patch('recipes.index.threading.Thread')
+    def test_stale_index_rebuilt_in_background(self, thread):
+        index = RecipeIngredientIndex()
+        self.create_recipe(self.flour)
+        built = index.get_index()
+        index._index = (built, index._index[1] - index.ttl - 1)
+        self.assertIs(index.get_index(), built)
+        self.assertIs(index.get_index(), built)
+        thread.assert_called_once_with(
+            target=index.rebuild, name='recipe-index', daemon=True)
+        thread.return_value.start.assert_called_once_with()
+        self.assertTrue(index.rebuilding)
+
+    @mock.patch('recipes.index.threading.Thread')
+    def test_outdated_index_rebuilt_in_request(self, thread):
+        index = RecipeIngredientIndex()
+        built = index.get_index()
+        index._index = (built, index._index[1] - 2 * index.ttl - 1)
+        self.assertIsNot(index.get_index(), built)
+        thread.assert_not_called()
+
+    @mock.patch('recipes.index.RECIPE_INDEX_PRUNE_EVERY', 1)
+    def test_old_changes_pruned_on_write(self):
+        old = self.create_recipe(self.flour)
+        RecipeIndexChange.objects.update(
+            created=timezone.now() - timedelta(
+                seconds=RECIPE_INDEX_CHANGES_RETENTION + 1))
+        recent = self.create_recipe(self.milk)
+        self.assertFalse(
+            RecipeIndexChange.objects.filter(recipe_id=old.id).exists())
+        self.assertTrue(
+            RecipeIndexChange.objects.filter(recipe_id=recent.id).exists())
+
+
+class NormalizeTest(SimpleTestCase):
+    """Объединение строк списка покупок в общих единицах."""
+
+    def test_single_unit_is_kept(self):
+        rows = [(1, 'мука', 'кг', 2), (2, 'соль', 'гр', 5)]
+        self.assertEqual(list(normalize(rows)), rows)
+
+    def test_merged_with_canonical_ingredient(self):
+        self.assertEqual(
+            list(normalize([(1, 'мука', 'г', 200), (2, 'мука', 'кг', 2)])),
+            [(1, 'мука', 'г', 2200)]
+        )
+
+    def test_merged_without_canonical_ingredient(self):
+        self.assertEqual(
+            list(normalize([
+                (1, 'молоко', 'l', 1), (2, 'молоко', 'л', 2),
+                (3, 'молоко', 'шт', 1)
+            ])),
+            [(None, 'молоко', 'мл', 3000), (3, 'молоко', 'шт', 1)]
+        )
+
+
+class ImportDataTest(SimpleTestCase):
+    """Чтение файлов ингредиентов командой import_data."""
+
+    items = [
+        {'name': 'мука', 'measurement_unit': 'г'},
+        {'name': 'молоко "3,2%"', 'measurement_unit': 'мл'},
+    ]
+
+    @mock.patch.object(import_data, 'JSON_CHUNK_SIZE', 5)
+    def test_read_json_in_chunks(self):
+        for text in (
+            json.dumps(self.items, ensure_ascii=False),
+            json.dumps(self.items, indent=4),
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(
+                    list(import_data.Command().read_json(io.StringIO(text))),
+                    [('мука', 'г'), ('молоко "3,2%"', 'мл')]
+                )
+        self.assertEqual(
+            list(import_data.Command().read_json(io.StringIO(' [ ] '))), [])
+
+    def test_invalid_json(self):
+        item = '{"name": "мука", "measurement_unit": "г"}'
+        for text in ('', '{}', f'[{item}', f'[{item}{item}]', f'[{item},]'):
+            with self.subTest(text=text):
+                with self.assertRaises(CommandError):
+                    list(import_data.Command().read_json(io.StringIO(text)))
+
+    def test_batch_size(self):
+        for batch_size in ('0', '-1'):
+            with self.subTest(batch_size=batch_size):
+                with self.assertRaises(CommandError):
+                    call_command('import_data', '--batch-size', batch_size)
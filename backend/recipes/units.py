@@ -0,0 +1,66 @@
+"""Приведение единиц измерения ингредиентов к общим единицам.
+
+Ингредиент с одним названием может храниться в разных единицах, например
+"мука (г)" и "мука (кг)". Такие строки списка покупок объединяются, а
+количества переводятся в единицу из UNITS. Единицы разных величин
+(масса, объем, штуки) не объединяются.
+"""
+
+UNITS = {
+    'г': ('г', 1),
+    'гр': ('г', 1),
+    'g': ('г', 1),
+    'кг': ('г', 1000),
+    'kg': ('г', 1000),
+    'мл': ('мл', 1),
+    'ml': ('мл', 1),
+    'л': ('мл', 1000),
+    'l': ('мл', 1000),
+    'шт': ('шт.', 1),
+    'pcs': ('шт.', 1),
+}
+
+
+def unit_key(unit):
+    return unit.lower().replace('.', '').replace(' ', '')
+
+
+def canonical_unit(unit):
+    """Общая единица и множитель перевода в нее."""
+    return UNITS.get(unit_key(unit), (unit, 1))
+
+
+def merge(name, groups):
+    """Строки одного названия, сгруппированные по общей единице."""
+    for canonical, rows in groups.items():
+        if len(rows) == 1:
+            yield rows[0]
+            continue
+        merged_id = None
+        total = 0
+        for ingredient_id, _, unit, amount in rows:
+            if unit == canonical:
+                merged_id = ingredient_id
+            total += amount * canonical_unit(unit)[1]
+        yield merged_id, name, canonical, total
+
+
+def normalize(rows):
+    """Суммирование количеств ингредиентов в общих единицах.
+
+    rows - кортежи (id ингредиента, название, единица, количество),
+    отсортированные по названию. Строки с одним названием объединяются
+    за один проход. Если для общей единицы есть одна строка, она
+    возвращается без изменений. Иначе возвращается кортеж с суммой в
+    общей единице и id ингредиента в этой единице или None, если
+    такого ингредиента нет в rows.
+    """
+    current = None
+    groups = {}
+    for row in rows:
+        if row[1] != current:
+            yield from merge(current, groups)
+            current = row[1]
+            groups = {}
+        groups.setdefault(canonical_unit(row[2])[0], []).append(row)
+    yield from merge(current, groups)
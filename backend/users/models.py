@@ -35,6 +35,30 @@ class User(AbstractUser):
         verbose_name='Аватар пользователя'
     )
 
+    avatar_variants = models.JSONField(
+        verbose_name='Уменьшенные копии аватара',
+        default=dict,
+        editable=False
+    )
+
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Число рецептов',
+        default=0,
+        editable=False
+    )
+
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0,
+        editable=False
+    )
+
+    shopping_cart_version = models.PositiveIntegerField(
+        verbose_name='Версия списка покупок',
+        default=0,
+        editable=False
+    )
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'